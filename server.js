@@ -3276,7 +3276,7 @@ app.get('/api/export/generate', async (req, res) => {
                 // SF2 Generation via local Python script
                 const tempId = crypto.randomBytes(8).toString('hex');
                 const jsonInputPath = path.join(tmpDir, `sf2_input_${tempId}.json`);
-                let generatedFilePath = null; // To hold the path of the generated file for cleanup
+                const runOutputDir = path.join(tmpDir, `sf2_run_${tempId}`); // Isolated per-export output directory
 
                 try {
                     await ensurePythonEnv();
@@ -3302,25 +3302,26 @@ app.get('/api/export/generate', async (req, res) => {
                     fs.writeFileSync(jsonInputPath, JSON.stringify(jsonOutput, null, 2));
 
                     // 3. Execute script
-                    const command = `"${pythonVenvPath}" main.py --json "${jsonInputPath}"`;
+                    // Reports go to a per-run directory and the script prints a JSON manifest
+                    // of what it wrote on stdout (progress messages go to stderr).
+                    const command = `"${pythonVenvPath}" main.py --json "${jsonInputPath}" --output-dir "${runOutputDir}" --emit-manifest`;
                     console.log(`[EXPORT] Executing SF2 script in ${scriptDir}: ${command}`);
                     const { stdout, stderr } = await execPromise(command, { cwd: scriptDir });
 
-                    if (stderr) console.warn(`[EXPORT] SF2 Script Stderr: ${stderr}`);
-                    console.log(`[EXPORT] SF2 Script Stdout: ${stdout}`);
+                    if (stderr) console.log(`[EXPORT] SF2 Script Log: ${stderr}`);
 
-                    // 4. Find the generated file by finding the most recently created .xlsx file
-                    // The python script outputs the file in the same directory as the input JSON, which is our /tmp directory.
-                    const files = fs.readdirSync(tmpDir);
-                    const mostRecentFile = files
-                        .filter(f => f.endsWith('.xlsx'))
-                        .map(f => ({ name: f, mtime: fs.statSync(path.join(tmpDir, f)).mtime.getTime() }))
-                        .sort((a, b) => b.mtime - a.mtime)[0];
+                    // 4. Locate the generated file from the manifest
+                    let manifest;
+                    try {
+                        manifest = JSON.parse(stdout);
+                    } catch (parseErr) {
+                        throw new Error(`SF2 generation failed. Could not read the script's output manifest: ${parseErr.message}`);
+                    }
+                    console.log(`[EXPORT] SF2 run ${manifest.run_id} finished in ${manifest.timings.total_ms} ms.`);
 
-                    if (mostRecentFile && (Date.now() - mostRecentFile.mtime) < 15000) { // Must be created in the last 15 seconds
-                        generatedFilePath = path.join(tmpDir, mostRecentFile.name);
-                    } else {
-                        throw new Error(`SF2 generation failed. Could not find the generated .xlsx file in the script's output directory.`);
+                    const generatedFilePath = manifest.outputs.length > 0 ? manifest.outputs[0].path : null;
+                    if (!generatedFilePath || !fs.existsSync(generatedFilePath)) {
+                        throw new Error(`SF2 generation failed. The manifest did not list a generated .xlsx file.`);
                     }
 
                     // 5. Send file
@@ -3347,8 +3348,8 @@ app.get('/api/export/generate', async (req, res) => {
                     if (fs.existsSync(jsonInputPath)) {
                         fs.unlinkSync(jsonInputPath);
                     }
-                    if (generatedFilePath && fs.existsSync(generatedFilePath)) {
-                        fs.unlinkSync(generatedFilePath);
+                    if (fs.existsSync(runOutputDir)) {
+                        fs.rmSync(runOutputDir, { recursive: true, force: true });
                     }
                 }
             }
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compares the /gen-sf2 archive modes (stored, deflated, single).
+
+Renders the reports for a JSON payload once, then packages them the way
+lib/network/handshake.py does for each mode and reports CPU time, wall
+time and response size. Run it from the directory holding sf2-template/:
+
+    python benchmarks/bench_archive.py path/to/payload.json --repeat 20
+"""
+import sys
+import os
+import io
+import time
+import zipfile
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import payload, json_processor
+
+MODES = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+}
+
+def package(parts, compression):
+    """Builds the response body for the given parts and compression."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', compression) as zf:
+        for file_name, data in parts:
+            zf.writestr(file_name, data)
+    return out.getvalue()
+
+def measure(fn, repeat):
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for _ in range(repeat):
+        size = len(fn())
+    cpu = (time.process_time() - cpu) / repeat
+    wall = (time.perf_counter() - wall) / repeat
+    return cpu, wall, size
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /gen-sf2 archive modes")
+    parser.add_argument("json", type=str, help="Payload to render (single section or bundle)")
+    parser.add_argument("--repeat", type=int, default=20, help="Iterations per mode")
+    args = parser.parse_args()
+
+    # 1. Render once; only the packaging step differs between modes
+    parsed = payload.load(args.json)
+    parsed.raise_for_errors()
+    parts = [(name, buf.getvalue()) for name, buf in json_processor.iter_rendered_parts(parsed, force_split=True)]
+    raw_size = sum(len(data) for _, data in parts)
+    print(f"Rendered {len(parts)} part(s), {raw_size} bytes of .xlsx")
+
+    # 2. Package
+    results = []
+    for mode, compression in MODES.items():
+        results.append((mode,) + measure(lambda: package(parts, compression), args.repeat))
+    if len(parts) == 1:
+        results.append(("single",) + measure(lambda: parts[0][1], args.repeat))
+    else:
+        # single falls back to a stored ZIP when there is more than one part
+        results.append(("single",) + measure(lambda: package(parts, zipfile.ZIP_STORED), args.repeat))
+
+    # 3. Report
+    print(f"\n{'mode':<10}{'cpu ms':>10}{'wall ms':>10}{'bytes':>12}{'vs raw':>9}")
+    for mode, cpu, wall, size in results:
+        print(f"{mode:<10}{cpu * 1000:>10.2f}{wall * 1000:>10.2f}{size:>12}{size / raw_size:>9.3f}")
+
+if __name__ == "__main__":
+    main()
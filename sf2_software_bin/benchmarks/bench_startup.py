@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Measures cold-start time of main.py's headless modes and fails when it
+regresses.
+
+Each mode is run as a fresh process --repeat times; the fastest run is kept.
+One extra run with `-X importtime` gives the per-module breakdown. Results
+are compared against benchmarks/startup_baseline.json:
+
+- a mode fails if its startup overhead (wall time minus a bare `python -c pass`)
+  exceeds the baseline by more than --tolerance, or
+- if it imports a module listed in FORBIDDEN for that mode.
+
+Run it from the directory holding sf2-template/ (the json-* modes are
+skipped without the template):
+
+    python benchmarks/bench_startup.py --repeat 10
+    python benchmarks/bench_startup.py --update-baseline
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+MAIN = os.path.join(APP_DIR, "main.py")
+BASELINE_FILE = os.path.join(BENCH_DIR, "startup_baseline.json")
+DEFAULT_PAYLOAD = os.path.join(APP_DIR, "test.json")
+TEMPLATE = os.path.join("sf2-template", "SF2Template.xlsx")
+
+# Heavy packages a headless mode must not load
+HEAVY = ["openpyxl", "numpy", "flask", "werkzeug", "PyQt6", "textual", "simple_term_menu", "dotenv"]
+
+# mode: (main.py arguments, feeds the payload on stdin, needs the template)
+MODES = {
+    "lint": (["--json-lintcheck", "{payload}"], False, False),
+    "json-xml": (["--json", "-", "--stdout", "--engine", "xml"], True, True),
+    "json-openpyxl": (["--json", "-", "--stdout", "--engine", "openpyxl"], True, True),
+}
+
+FORBIDDEN = {
+    "lint": HEAVY,
+    "json-xml": HEAVY,
+    # openpyxl imports numpy itself when it is installed
+    "json-openpyxl": [name for name in HEAVY if name not in ("openpyxl", "numpy")],
+}
+
+def run(argv, stdin_path=None, env=None):
+    """Runs argv once; returns (wall seconds, stderr text)."""
+    stdin = open(stdin_path, 'rb') if stdin_path else subprocess.DEVNULL
+    try:
+        start = time.perf_counter()
+        proc = subprocess.run(argv, stdin=stdin, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, env=env)
+        wall = time.perf_counter() - start
+    finally:
+        if stdin_path:
+            stdin.close()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with {proc.returncode}:\n{proc.stderr.decode(errors='replace')}")
+    return wall, proc.stderr.decode(errors="replace")
+
+def best_of(argv, stdin_path, repeat):
+    return min(run(argv, stdin_path)[0] for _ in range(repeat))
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure_mode(mode, payload_path, repeat, interpreter_s):
+    args, use_stdin, _ = MODES[mode]
+    argv = [sys.executable, MAIN] + [a.format(payload=payload_path) for a in args]
+    stdin_path = payload_path if use_stdin else None
+
+    # 1. Wall time
+    wall = best_of(argv, stdin_path, repeat)
+
+    # 2. Import breakdown
+    _, stderr = run([sys.executable, "-X", "importtime"] + argv[1:], stdin_path)
+    modules = parse_importtime(stderr)
+    top_level = {name: cumulative for name, (_, cumulative) in modules.items() if "." not in name}
+    heaviest = sorted(top_level.items(), key=lambda item: -item[1])[:8]
+
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "overhead_ms": round((wall - interpreter_s) * 1000, 1),
+        "import_ms": round(sum(s for s, _ in modules.values()) / 1000, 1),
+        "modules": len(modules),
+        "heaviest": [[name, round(us / 1000, 1)] for name, us in heaviest],
+        "forbidden": sorted(name for name in FORBIDDEN[mode] if name in modules),
+    }
+
+def check(mode, result, baseline, tolerance, slack_ms):
+    """Returns a list of failure messages for one mode."""
+    failures = [f"{mode}: imports {name}" for name in result["forbidden"]]
+    if baseline:
+        limit = baseline["overhead_ms"] * (1 + tolerance) + slack_ms
+        if result["overhead_ms"] > limit:
+            failures.append(f"{mode}: startup overhead {result['overhead_ms']} ms "
+                            f"exceeds {limit:.1f} ms (baseline {baseline['overhead_ms']} ms)")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main.py cold-start time per headless mode")
+    parser.add_argument("--payload", type=str, default=DEFAULT_PAYLOAD, help="SF2 JSON payload to run the modes with")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode (the fastest one counts)")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help="Comma-separated modes to run")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression of startup overhead")
+    parser.add_argument("--slack-ms", type=float, default=25.0, help="Allowed absolute regression, absorbs timer noise")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to startup_baseline.json")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"Unknown mode(s): {', '.join(unknown)}")
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE) and not args.update_baseline:
+        with open(BASELINE_FILE, 'r') as f:
+            baselines = json.load(f).get("modes", {})
+
+    # 1. Bare interpreter, subtracted so baselines carry over between machines
+    interpreter_s = best_of([sys.executable, "-c", "pass"], None, args.repeat)
+    print(f"Interpreter startup: {interpreter_s * 1000:.1f} ms")
+
+    # 2. Modes
+    results = {}
+    failures = []
+    for mode in modes:
+        if MODES[mode][2] and not os.path.exists(TEMPLATE):
+            print(f"\n{mode}: skipped ({TEMPLATE} not found in {os.getcwd()})")
+            continue
+        result = measure_mode(mode, args.payload, args.repeat, interpreter_s)
+        results[mode] = result
+        failures += check(mode, result, baselines.get(mode), args.tolerance, args.slack_ms)
+
+        print(f"\n{mode}: {result['wall_ms']} ms wall, {result['overhead_ms']} ms over the interpreter, "
+              f"{result['import_ms']} ms in {result['modules']} imports")
+        for name, ms in result["heaviest"]:
+            print(f"    {name:<28}{ms:>8.1f} ms")
+
+    # 3. Baseline / verdict
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump({"python": sys.version.split()[0], "interpreter_ms": round(interpreter_s * 1000, 1),
+                       "modes": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {BASELINE_FILE}")
+        return
+
+    if failures:
+        print("\nREGRESSION:")
+        for message in failures:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\nOK: no startup regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+SF2 attendance tool library.
+
+Submodules are loaded on first attribute access (`lib.processor`,
+`lib.json_processor`, ...) instead of when the package is imported, so
+that a headless run only pays for the modules it actually uses.
+"""
+import importlib as _importlib
+
+_SUBMODULES = (
+    "attendance_matrix",
+    "composer_gui",
+    "composer_tui",
+    "csv_processor",
+    "daemon",
+    "guardrails",
+    "json_lintcheck",
+    "json_processor",
+    "network",
+    "parser",
+    "payload",
+    "processor",
+    "result_cache",
+    "school_calendar",
+    "student",
+    "template_cache",
+    "tui",
+    "ui",
+    "xml_engine",
+)
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = _importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -0,0 +1,252 @@
+"""
+Attendance matrix for one SF2 section.
+
+Rows are students (males first, then females, in report order), columns are
+the report's date columns and every value is a status code. All SF2
+statistics (daily male/female/combined totals, per-student absences and
+presence, monthly averages) are computed from the matrix in batch, so they
+can be written into the sheet or used without opening a spreadsheet:
+
+    matrix = attendance_matrix.build(section)
+    matrix.absences()        # [2, 0, 1, ...] per student
+    matrix.daily_totals()    # {"male": [...], "female": [...], "combined": [...]}
+    matrix.summary()         # JSON-ready dict with everything above
+
+Backends: NumPy arrays, or a flat array('b') when NumPy is unavailable.
+SF2_MATRIX_BACKEND selects one: "numpy", "array" or "auto" (default). "auto"
+uses NumPy only when it is already imported (e.g. by openpyxl or a warm
+server), because importing it costs more than a 60 x 25 report takes to
+compute.
+"""
+import os
+import sys
+from array import array
+from .student import Student
+
+# Status codes
+STATUS_PRESENT = 0
+STATUS_ABSENT = 1
+STATUS_CODES = {"PRESENT": STATUS_PRESENT, "ABSENT": STATUS_ABSENT}
+
+BACKEND_NUMPY = "numpy"
+BACKEND_ARRAY = "array"
+
+def resolve_backend(backend=None):
+    """
+    Returns the backend to use: the given one, else SF2_MATRIX_BACKEND, else
+    "auto". Falls back to "array" when NumPy cannot be imported.
+    """
+    backend = (backend or os.environ.get("SF2_MATRIX_BACKEND") or "auto").strip().lower()
+    if backend not in ("auto", BACKEND_NUMPY, BACKEND_ARRAY):
+        raise ValueError(f"Unknown matrix backend '{backend}'. Expected one of: auto, numpy, array")
+
+    if backend == "auto":
+        return BACKEND_NUMPY if "numpy" in sys.modules else BACKEND_ARRAY
+    if backend == BACKEND_NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            return BACKEND_ARRAY
+    return backend
+
+def status_code(status):
+    # Anything that is not ABSENT is rendered as present, like the sheet does.
+    return STATUS_CODES.get(status, STATUS_PRESENT)
+
+def build(section, max_days=None, max_students=None, backend=None):
+    """
+    Builds the matrix for a normalized section (see payload.parse).
+    Students may be student.Student records or dicts with an "attendance"
+    dict (the composers' form).
+    max_days / max_students cap the date columns and the students per gender
+    the same way the template does; holiday columns are kept but never
+    marked.
+    """
+    source_dates = section.get("dates", [])
+    dates = list(source_dates)
+    if max_days is not None:
+        dates = dates[:max_days]
+    holidays = section.get("holidays", set())
+
+    males = list(section.get("students_male", []))
+    females = list(section.get("students_female", []))
+    if max_students is not None:
+        males = males[:max_students]
+        females = females[:max_students]
+
+    school_days = [date_str not in holidays for date_str in dates]
+    students = males + females
+
+    # Single pass over the attendance; everything else works on codes.
+    cols = len(dates)
+    school_mask = sum(1 << col for col, is_school_day in enumerate(school_days) if is_school_day)
+    flat = array('b', bytes(len(students) * cols))
+    for row, student in enumerate(students):
+        if isinstance(student, Student) and student.dates is source_dates:
+            # Bit i of the mask is column i: only the absent days are visited
+            mask = student.absent & school_mask
+            while mask:
+                low = mask & -mask
+                flat[row * cols + low.bit_length() - 1] = STATUS_ABSENT
+                mask ^= low
+            continue
+
+        attendance = student.get("attendance", {})
+        if not attendance:
+            continue
+        base = row * cols
+        for col, date_str in enumerate(dates):
+            if school_days[col]:
+                code = status_code(attendance.get(date_str, "PRESENT"))
+                if code:
+                    flat[base + col] = code
+
+    return AttendanceMatrix(
+        dates,
+        school_days,
+        [s.get("name", "") for s in males],
+        [s.get("name", "") for s in females],
+        flat,
+        resolve_backend(backend),
+    )
+
+class AttendanceMatrix:
+    """
+    Status codes of one section plus the statistics derived from them.
+    Use build() rather than the constructor.
+    """
+
+    def __init__(self, dates, school_days, names_male, names_female, flat, backend=BACKEND_ARRAY):
+        self.dates = dates
+        self.school_days = school_days
+        self.names_male = names_male
+        self.names_female = names_female
+        self.backend = backend
+        self.n_male = len(names_male)
+        self.n_female = len(names_female)
+        self.n_days = len(dates)
+
+        if backend == BACKEND_NUMPY:
+            import numpy
+            self.codes = numpy.frombuffer(flat.tobytes(), dtype=numpy.int8).reshape(
+                self.n_male + self.n_female, self.n_days)
+        else:
+            self.codes = flat
+
+    @property
+    def school_day_count(self):
+        return sum(self.school_days)
+
+    def row(self, index):
+        """
+        Status codes of one student (male rows first), one per date column.
+        """
+        if self.backend == BACKEND_NUMPY:
+            return self.codes[index].tolist()
+        start = index * self.n_days
+        return self.codes[start:start + self.n_days].tolist()
+
+    def rows(self, gender):
+        """
+        Status code rows of the "male" or "female" students, in report order.
+        """
+        offset, count = (0, self.n_male) if gender == "male" else (self.n_male, self.n_female)
+        return [self.row(offset + i) for i in range(count)]
+
+    # 1. Per-student statistics
+
+    def absences(self):
+        """
+        Absent school days per student (male rows first).
+        """
+        if self.backend == BACKEND_NUMPY:
+            return (self.codes == STATUS_ABSENT).sum(axis=1).tolist()
+        cols = self.n_days
+        return [self.codes[r * cols:(r + 1) * cols].count(STATUS_ABSENT)
+                for r in range(self.n_male + self.n_female)]
+
+    def presence(self):
+        """
+        Present school days per student (school days minus absences).
+        """
+        days = self.school_day_count
+        return [days - absent for absent in self.absences()]
+
+    # 2. Daily statistics
+
+    def _daily_absent(self, start, stop):
+        if self.backend == BACKEND_NUMPY:
+            return (self.codes[start:stop] == STATUS_ABSENT).sum(axis=0).tolist()
+        cols = self.n_days
+        return [self.codes[start * cols + col:stop * cols:cols].count(STATUS_ABSENT)
+                for col in range(cols)]
+
+    def daily_absences(self):
+        """
+        Absent students per date column: {"male": [...], "female": [...]}.
+        """
+        return {
+            "male": self._daily_absent(0, self.n_male),
+            "female": self._daily_absent(self.n_male, self.n_male + self.n_female),
+        }
+
+    def daily_totals(self):
+        """
+        Students present per date column for males, females and combined.
+        Holiday columns are None, matching the blank cells in the sheet.
+        """
+        absent = self.daily_absences()
+        absent_male, absent_female = absent["male"], absent["female"]
+
+        totals = {"male": [], "female": [], "combined": []}
+        for col, is_school_day in enumerate(self.school_days):
+            if not is_school_day:
+                for values in totals.values():
+                    values.append(None)
+                continue
+            male = self.n_male - absent_male[col]
+            female = self.n_female - absent_female[col]
+            totals["male"].append(male)
+            totals["female"].append(female)
+            totals["combined"].append(male + female)
+        return totals
+
+    # 3. Monthly statistics
+
+    def averages(self, totals=None):
+        """
+        Average daily attendance over the school days, per gender and
+        combined, plus the combined attendance rate in percent.
+        """
+        totals = totals or self.daily_totals()
+        days = self.school_day_count
+        result = {}
+        for key, values in totals.items():
+            present = sum(v for v in values if v is not None)
+            result[key] = round(present / days, 2) if days else 0.0
+
+        enrolled = self.n_male + self.n_female
+        result["attendance_rate"] = round(result["combined"] / enrolled * 100, 2) if enrolled else 0.0
+        return result
+
+    def summary(self):
+        """
+        All statistics as a JSON-serializable dict.
+        """
+        totals = self.daily_totals()
+        absences = self.absences()
+        days = self.school_day_count
+        names = [(name, "M") for name in self.names_male] + [(name, "F") for name in self.names_female]
+
+        return {
+            "school_days": days,
+            "dates": self.dates,
+            "enrolled": {"male": self.n_male, "female": self.n_female,
+                         "combined": self.n_male + self.n_female},
+            "daily_totals": totals,
+            "averages": self.averages(totals),
+            "students": [
+                {"name": name, "gender": gender, "absences": absent, "present": days - absent}
+                for (name, gender), absent in zip(names, absences)
+            ],
+        }
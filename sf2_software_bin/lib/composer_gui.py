@@ -1,11 +1,11 @@
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QLineEdit, QDialog, 
-    QMessageBox, QTableWidget, QTableWidgetItem, 
+    QMessageBox, QTableWidget, QTableWidgetItem, QTableView, 
     QHeaderView, QRadioButton, QButtonGroup, QAbstractItemView,
     QScrollArea, QFrame, QGridLayout, QFileDialog
 )
-from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtCore import Qt, QSize, QAbstractTableModel, QModelIndex
 from PyQt6.QtGui import QColor, QBrush, QFont
 import datetime
 import calendar
@@ -15,8 +15,12 @@ import sys
 # Import shared processor logic
 try:
     from . import processor
+    from . import school_calendar
+    from .student import STATUS_ABSENT, STATUS_PRESENT
 except ImportError:
     import processor
+    import school_calendar
+    from student import STATUS_ABSENT, STATUS_PRESENT
 
 class SchoolInfoDialog(QDialog):
     def __init__(self, parent=None):
@@ -205,224 +209,100 @@ class StudentManagerDialog(QDialog):
             self.table.setItem(i, 0, QTableWidgetItem(s["name"]))
             self.table.setItem(i, 1, QTableWidgetItem(gender))
 
-class AttendanceMatrixWindow(QMainWindow):
-    def __init__(self, school_data, students_male, students_female):
-        super().__init__()
-        self.setWindowTitle("Step 3: Attendance Matrix")
-        self.resize(1000, 600)
-        
-        self.school_data = school_data
-        self.students_male = students_male
-        self.students_female = students_female
-        
-        # Calculate Dates
-        try:
-            self.dates = processor.get_weekdays_in_month(
-                school_data["school_year"], school_data["month"]
-            )
-        except Exception as e:
-            QMessageBox.critical(self, "Date Error", str(e))
-            self.dates = []
+class AttendanceMatrixModel(QAbstractTableModel):
+    """
+    Name column + one column per date, read from a status matrix: one
+    absence bitmask per row (bit j = dates[j]), as in student.Student.
+    Cells are drawn on demand with shared brushes, so building the view
+    costs nothing per cell and a click repaints a single cell.
+    """
 
-        self.holidays = set()
-        
-        # UI
-        central = QWidget()
-        self.setCentralWidget(central)
-        layout = QVBoxLayout(central)
-        
-        # Info Header
-        info_label = QLabel(f"School: {school_data['school_name']} | Year: {school_data['school_year']} | Month: {school_data['month']}")
-        info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        info_label.setStyleSheet("font-weight: bold; font-size: 14px; padding: 5px;")
-        layout.addWidget(info_label)
-        
-        help_label = QLabel("Left Click Cell: Toggle Present/Absent | Click Header: Toggle Holiday (Red)")
-        help_label.setStyleSheet("color: gray;")
-        layout.addWidget(help_label)
-        
-        # Matrix Table
-        self.table = QTableWidget()
-        layout.addWidget(self.table)
-        
-        # Buttons
-        btn_layout = QHBoxLayout()
-        self.btn_save = QPushButton("Save to Excel")
-        self.btn_save.clicked.connect(self.save_file)
-        self.btn_save.setStyleSheet("background-color: #4CAF50; color: white; padding: 5px;")
-        
-        btn_layout.addStretch()
-        btn_layout.addWidget(self.btn_save)
-        layout.addLayout(btn_layout)
-        
-        self.setup_table()
-        
-    def setup_table(self):
-        # Columns: Name + Dates
-        self.table.setColumnCount(1 + len(self.dates))
-        
-        headers = ["Name"]
-        for d in self.dates:
-            dt = datetime.datetime.strptime(d, "%Y-%m-%d")
-            day_str = dt.strftime("%d")
-            day_map = ["(M)", "(T)", "(W)", "(TH)", "(F)", "(S)", "(SU)"]
-            day_name = day_map[dt.weekday()]
-            headers.append(f"{day_str}\n{day_name}")
-            
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.horizontalHeader().sectionClicked.connect(self.on_header_clicked)
-        
-        # Rows
-        all_students = self.students_male + self.students_female
-        self.table.setRowCount(len(all_students))
-        
-        for i, s in enumerate(all_students):
-            # Name Item (Read Only)
-            name_item = QTableWidgetItem(s["name"])
-            name_item.setFlags(name_item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 0, name_item)
-            
-            # Date Cells
-            for j, d in enumerate(self.dates):
-                status = s.get("attendance", {}).get(d, "PRESENT")
-                text = "P" if status == "PRESENT" else "A"
-                if d in self.holidays:
-                    text = "" # Holiday usually blank in body? Or 'H'? 
-                              # TUI used 'H' or blank. Processor skips blank.
-                              # Let's use visual cues mostly.
-                
-                item = QTableWidgetItem(text)
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                item.setFlags(item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                
-                self.update_cell_visuals(item, status, d in self.holidays)
-                self.table.setItem(i, j+1, item)
-                
-        self.table.cellClicked.connect(self.on_cell_clicked)
+    def __init__(self, students_male, students_female, month, holidays, parent=None):
+        super().__init__(parent)
+        # month: the school_calendar.MonthCalendar (None when the dates failed)
+        self.dates = list(month.dates) if month else []
+        self.holidays = holidays
+        self.date_index = month.index if month else {}
+        self.headers = ["Name"] + ["{}\n{}".format(*school_calendar.day_label(d)) for d in self.dates]
 
-    def update_cell_visuals(self, item, status, is_holiday):
-        if is_holiday:
-            item.setBackground(QColor("#FFCDD2")) # Light Red
-            item.setText("")
-        elif status == "ABSENT":
-            item.setBackground(QColor("#FFEBEE"))
-            item.setForeground(QColor("red"))
-            item.setText("A")
-        else:
-            item.setBackground(QColor("white"))
-            item.setForeground(QColor("black"))
-            item.setText("P")
+        # Row -> student, built once
+        self.students = students_male + students_female
+        self.absent = []
+        for s in self.students:
+            mask = 0
+            for date_str, status in s.get("attendance", {}).items():
+                ordinal = self.date_index.get(date_str)
+                if status == STATUS_ABSENT and ordinal is not None:
+                    mask |= 1 << ordinal
+            self.absent.append(mask)
 
-    def on_cell_clicked(self, row, col):
-        if col == 0: return
-        
-        date_str = self.dates[col-1]
-        
-        # If Holiday, maybe warn or allow toggle? 
-        if date_str in self.holidays:
-            QMessageBox.information(self, "Holiday", "This day is marked as a Holiday. Click the header to unmark it.")
-            return
+        # (background, foreground) per cell state
+        self.brushes = {
+            "holiday": (QBrush(QColor("#FFCDD2")), QBrush(QColor("black"))), # Light Red
+            "A": (QBrush(QColor("#FFEBEE")), QBrush(QColor("red"))),
+            "P": (QBrush(QColor("white")), QBrush(QColor("black"))),
+        }
 
-        all_students = self.students_male + self.students_female
-        student = all_students[row]
-        
-        current = student.get("attendance", {}).get(date_str, "PRESENT")
-        new_status = "ABSENT" if current == "PRESENT" else "PRESENT"
-        
-        # Update Data
-        if "attendance" not in student: student["attendance"] = {}
-        student["attendance"][date_str] = new_status
-        
-        # Update UI
-        item = self.table.item(row, col)
-        self.update_cell_visuals(item, new_status, False)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.students)
 
-    def on_header_clicked(self, idx):
-        if idx == 0: return
-        
-        date_str = self.dates[idx-1]
-        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1 + len(self.dates)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def cell_state(self, row, col):
+        if self.dates[col - 1] in self.holidays:
+            return "holiday"
+        return "A" if self.absent[row] >> (col - 1) & 1 else "P"
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if col == 0:
+            return self.students[row]["name"] if role == Qt.ItemDataRole.DisplayRole else None
+
+        state = self.cell_state(row, col)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return "" if state == "holiday" else state
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return self.brushes[state][0]
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self.brushes[state][1]
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def toggle(self, row, col):
+        """
+        Flips a learner's mark and writes it back to the student dict.
+        """
+        ordinal = col - 1
+        self.absent[row] ^= 1 << ordinal
+        status = STATUS_ABSENT if self.absent[row] >> ordinal & 1 else STATUS_PRESENT
+        self.students[row].setdefault("attendance", {})[self.dates[ordinal]] = status
+
+        index = self.index(row, col)
+        self.dataChanged.emit(index, index)
+
+    def toggle_holiday(self, col):
+        date_str = self.dates[col - 1]
         if date_str in self.holidays:
             self.holidays.remove(date_str)
         else:
             self.holidays.add(date_str)
-            
-        # Refresh Data Column
-        all_students = self.students_male + self.students_female
-        for i, s in enumerate(all_students):
-            item = self.table.item(i, idx)
-            status = s.get("attendance", {}).get(date_str, "PRESENT")
-            self.update_cell_visuals(item, status, date_str in self.holidays)
-
-    def save_file(self):
-        reply = QMessageBox.question(self, "Confirm Save", 
-                                   "Are you sure you want to save this attendance report?",
-                                   QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-        if reply != QMessageBox.StandardButton.Yes:
-            return
-
-        default_name = f"Attendance_{self.school_data['month']}_{self.school_data['section']}.xlsx"
-        # Sanitize
-        default_name = default_name.replace(" ", "_")
-        
-        # File Dialog
-        # We can simulate the timestamp logic if we just do logical save, 
-        # but usage of QFileDialog suggests interactive choice.
-        # User requirement: "if theres a duplicate, just attatch the date and time"
-        # Since this is a GUI "Save As", the user picks the name. 
-        # But if we just want "Save", we can auto-generate.
-        # Let's let user pick, but if they pick an existing one, we warn OR we implement the requirement.
-        # The requirement "strict regex on saving like if the user inputs spaces... become underscore" implies input field.
-        # Let's use an input dialog for filename to strictly follow user's TUI request logic?
-        # Or standard QFileDialog? QFileDialog is better for GUI. 
-        # Let's use QFileDialog but apply sanitization to the result.
-        
-        cwd = os.getcwd()
-        fpath, _ = QFileDialog.getSaveFileName(self, "Save Attendance Report", os.path.join(cwd, default_name), "Excel Files (*.xlsx)")
-        
-        if not fpath:
-            return
-            
-        # Apply Sanitization logic to the chosen BASENAME
-        dirname = os.path.dirname(fpath)
-        basename = os.path.basename(fpath)
-        
-        # Replace spaces
-        basename = basename.replace(" ", "_")
-        
-        # Check duplicate (if QFileDialog didn't already warn? It usually does).
-        # But if we change the name (Sanitization), we might collide with another file.
-        final_path = os.path.join(dirname, basename)
-        
-        if os.path.exists(final_path):
-             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-             base, ext = os.path.splitext(basename)
-             basename = f"{base}_{timestamp}{ext}"
-             final_path = os.path.join(dirname, basename)
-             QMessageBox.information(self, "File Exists", f"Filename collision detected. Saving as {basename}")
-             
-        try:
-            # Prepare Data Package for Processor
-            composer_data = {
-                "school_name": self.school_data["school_name"],
-                "school_id": self.school_data["school_id"],
-                "school_year": self.school_data["school_year"],
-                "month": self.school_data["month"],
-                "grade": self.school_data["grade"],
-                "section": self.school_data["section"],
-                "dates": self.dates,
-                "holidays": self.holidays,
-                "students_male": self.students_male,
-                "students_female": self.students_female
-            }
-            
-            template = os.path.join(os.getcwd(), "sf2-template", "SF2Template.xlsx")
-            processor.save_to_excel(composer_data, template, final_path)
-            QMessageBox.information(self, "Success", f"File saved successfully to:\n{final_path}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to save: {str(e)}")
 
+        if self.students:
+            self.dataChanged.emit(self.index(0, col), self.index(len(self.students) - 1, col))
 
 class AttendanceMatrixWindow(QMainWindow):
     def __init__(self, school_data, students_male, students_female):
@@ -436,11 +316,11 @@ class AttendanceMatrixWindow(QMainWindow):
         
         # Calculate Dates
         try:
-            self.dates = processor.get_weekdays_in_month(
-                school_data["school_year"], school_data["month"]
-            )
+            self.month = school_calendar.get_month(school_data["school_year"], school_data["month"])
+            self.dates = list(self.month.dates)
         except Exception as e:
             QMessageBox.critical(self, "Date Error", str(e))
+            self.month = None
             self.dates = []
 
         self.holidays = set()
@@ -461,7 +341,7 @@ class AttendanceMatrixWindow(QMainWindow):
         layout.addWidget(help_label)
         
         # Matrix Table
-        self.table = QTableWidget()
+        self.table = QTableView()
         layout.addWidget(self.table)
         
         # Buttons
@@ -477,99 +357,25 @@ class AttendanceMatrixWindow(QMainWindow):
         self.setup_table()
         
     def setup_table(self):
-        # Columns: Name + Dates
-        self.table.setColumnCount(1 + len(self.dates))
-        
-        headers = ["Name"]
-        for d in self.dates:
-            dt = datetime.datetime.strptime(d, "%Y-%m-%d")
-            day_str = dt.strftime("%d")
-            day_map = ["(M)", "(T)", "(W)", "(TH)", "(F)", "(S)", "(SU)"]
-            day_name = day_map[dt.weekday()]
-            headers.append(f"{day_str}\n{day_name}")
-            
-        self.table.setHorizontalHeaderLabels(headers)
+        self.model = AttendanceMatrixModel(self.students_male, self.students_female, self.month, self.holidays, self)
+        self.table.setModel(self.model)
         self.table.horizontalHeader().sectionClicked.connect(self.on_header_clicked)
-        
-        # Rows
-        all_students = self.students_male + self.students_female
-        self.table.setRowCount(len(all_students))
-        
-        for i, s in enumerate(all_students):
-            # Name Item (Read Only)
-            name_item = QTableWidgetItem(s["name"])
-            name_item.setFlags(name_item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 0, name_item)
-            
-            # Date Cells
-            for j, d in enumerate(self.dates):
-                status = s.get("attendance", {}).get(d, "PRESENT")
-                text = "P" if status == "PRESENT" else "A"
-                if d in self.holidays:
-                    text = "" 
-                
-                item = QTableWidgetItem(text)
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                item.setFlags(item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                
-                self.update_cell_visuals(item, status, d in self.holidays)
-                self.table.setItem(i, j+1, item)
-                
-        self.table.cellClicked.connect(self.on_cell_clicked)
+        self.table.clicked.connect(self.on_cell_clicked)
 
-    def update_cell_visuals(self, item, status, is_holiday):
-        if is_holiday:
-            item.setBackground(QColor("#FFCDD2")) # Light Red
-            item.setText("")
-        elif status == "ABSENT":
-            item.setBackground(QColor("#FFEBEE"))
-            item.setForeground(QColor("red"))
-            item.setText("A")
-        else:
-            item.setBackground(QColor("white"))
-            item.setForeground(QColor("black"))
-            item.setText("P")
-
-    def on_cell_clicked(self, row, col):
+    def on_cell_clicked(self, index):
+        row, col = index.row(), index.column()
         if col == 0: return
         
-        date_str = self.dates[col-1]
-        
         # If Holiday, maybe warn or allow toggle? 
-        if date_str in self.holidays:
+        if self.dates[col-1] in self.holidays:
             QMessageBox.information(self, "Holiday", "This day is marked as a Holiday. Click the header to unmark it.")
             return
 
-        all_students = self.students_male + self.students_female
-        student = all_students[row]
-        
-        current = student.get("attendance", {}).get(date_str, "PRESENT")
-        new_status = "ABSENT" if current == "PRESENT" else "PRESENT"
-        
-        # Update Data
-        if "attendance" not in student: student["attendance"] = {}
-        student["attendance"][date_str] = new_status
-        
-        # Update UI
-        item = self.table.item(row, col)
-        self.update_cell_visuals(item, new_status, False)
+        self.model.toggle(row, col)
 
     def on_header_clicked(self, idx):
         if idx == 0: return
-        
-        date_str = self.dates[idx-1]
-        
-        if date_str in self.holidays:
-            self.holidays.remove(date_str)
-        else:
-            self.holidays.add(date_str)
-            
-        # Refresh Data Column
-        all_students = self.students_male + self.students_female
-        for i, s in enumerate(all_students):
-            item = self.table.item(i, idx)
-            status = s.get("attendance", {}).get(date_str, "PRESENT")
-            self.update_cell_visuals(item, status, date_str in self.holidays)
+        self.model.toggle_holiday(idx)
 
     def save_file(self):
         reply = QMessageBox.question(self, "Confirm Save", 
@@ -4,6 +4,7 @@ from textual.widgets import Header, Footer, Input, Button, Label, DataTable, Sta
 from textual.containers import Container, Grid, Horizontal, Vertical
 from textual.reactive import reactive
 from . import processor
+from . import school_calendar
 import datetime
 import os
 
@@ -174,13 +175,8 @@ class AttendanceScreen(Screen):
         # dates are "YYYY-MM-DD"
         cols = ["Name"]
         for d in dates:
-            dt = datetime.datetime.strptime(d, "%Y-%m-%d")
-            day_str = dt.strftime("%d") # 05
-            # Custom Day Name map
-            # M, T, W, TH, F
-            weekday = dt.weekday()
-            day_map = ["(M)", "(T)", "(W)", "(TH)", "(F)", "(S)", "(SU)"]
-            day_name = day_map[weekday]
+            # "05", "(M)" / "(TH)" ...
+            day_str, day_name = school_calendar.day_label(d)
             
             # Single line label for better compatibility
             label = f"{day_str} {day_name}"
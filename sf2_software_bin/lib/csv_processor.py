@@ -1,201 +1,283 @@
 import csv
 import os
+import itertools
 import datetime
 from . import processor
+from .student import Student
 
-def process_csv_to_excel(csv_path, output_path=None):
+# Metadata lines:
+# Line 1: School Name:,"Name",School ID:,"ID"
+# Line 2: School Year:,"Year",Month:,"Month"
+# Line 3: Grade & Section:,"Grade - Section"
+LABEL_SCHOOL_NAME = "School Name:"
+LABEL_SCHOOL_ID = "School ID:"
+LABEL_SCHOOL_YEAR = "School Year:"
+LABEL_MONTH = "Month:"
+LABEL_GRADE_SECTION = "Grade & Section:"
+METADATA_LABELS = (LABEL_SCHOOL_NAME, LABEL_SCHOOL_ID, LABEL_SCHOOL_YEAR, LABEL_MONTH, LABEL_GRADE_SECTION)
+
+# The student table starts with this header cell
+HEADER_FIRST = "Student ID"
+
+# Fallback positions when the header has no such column: ID, Last, First, Gender, Dates...
+DEFAULT_COLUMNS = {"Last Name": 1, "First Name": 2, "Gender": 3}
+
+def process_csv_to_excel(csv_path, output_path=None, output_dir=None, run_id=None):
     """
     Parses the specific CSV format for Attendance and generates an Excel report.
+    Without output_path the report is written to output_dir, or next to the
+    CSV with the run id appended to its name (see json_processor.write_reports).
+
+    School-wide exports holding several sections (repeated metadata blocks,
+    or "Grade & Section" / "Grade" + "Section" columns) get one report per
+    section. The file is streamed and each section is rendered as soon as
+    its last row is read, so memory stays bounded by two sections. With
+    output_path, a multi-section CSV gets one file per section named
+    <output>_G<grade>_<section>.xlsx. If the CSV turns out to be invalid
+    part-way, the ValueError lists the reports already written.
+    Returns the output path, or the list of paths for a multi-section CSV.
     """
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"CSV file not found: {csv_path}")
 
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        lines = [line.strip() for line in f.readlines()]
-
-    # 1. Parse Metadata (Lines 1-3)
-    # Expected: 
-    # Line 1: School Name:,"Name",School ID:,"ID"
-    # Line 2: School Year:,"Year",Month:,"Month"
-    # Line 3: Grade & Section:,"Grade - Section"
-    
-    school_info = {}
-    
-    # Helper to clean quotes and whitespace
-    def clean(val):
-        return val.replace('"', '').strip()
-
-    # Simple CSV reader for metadata lines to handle quoted strings easily
-    reader = csv.reader(lines)
-    all_rows = list(reader)
-    
-    # Line 1
-    if len(all_rows) > 0:
-        row1 = all_rows[0]
-        # Assuming layout: [Label, Value, Label, Value]
-        # Find "School Name:" index
-        try:
-            idx_name = row1.index("School Name:")
-            school_info["school_name"] = row1[idx_name + 1]
-        except ValueError:
-            school_info["school_name"] = "Unknown"
-            
-        try:
-            idx_id = row1.index("School ID:")
-            school_info["school_id"] = row1[idx_id + 1]
-        except ValueError:
-            school_info["school_id"] = ""
+    run_id = run_id or processor.new_run_id()
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
-    # Line 2
-    if len(all_rows) > 1:
-        row2 = all_rows[1]
-        try:
-            idx_sy = row2.index("School Year:")
-            school_info["school_year"] = row2[idx_sy + 1]
-        except ValueError:
-            school_info["school_year"] = ""
-            
-        try:
-            idx_mo = row2.index("Month:")
-            school_info["month"] = row2[idx_mo + 1]
-            # If Month is "2026-02", convert to "February"
-            try:
-                dt_mo = datetime.datetime.strptime(school_info["month"], "%Y-%m")
-                school_info["month"] = dt_mo.strftime("%B")
-            except:
-                pass # Keep as is if not YYYY-MM
-        except ValueError:
-            school_info["month"] = ""
+    # Template
+    template = os.path.join(os.getcwd(), "sf2-template", "SF2Template.xlsx")
+
+    paths = []
+    taken = set()
+    sections = iter_sections(csv_path)
+    try:
+        # Read one section ahead so a multi-section CSV is known before the
+        # first report is named
+        ahead = list(itertools.islice(sections, 2))
+        multi = len(ahead) > 1
+
+        for composer_data in itertools.chain(ahead, sections):
+            path = _section_output_path(composer_data, csv_path, output_path, output_dir, run_id, taken, multi)
+
+            print(f"Generating report for {composer_data['school_name']}...")
+            processor.save_to_excel(composer_data, template, path)
+            print(f"Successfully saved to: {path}")
+            paths.append(path)
+    except ValueError as e:
+        if paths:
+            raise ValueError(f"{e} (reports already written: {', '.join(paths)})") from e
+        raise
+
+    if not paths:
+        raise ValueError("No sections found in CSV.")
+    return paths[0] if len(paths) == 1 else paths
+
+def _section_output_path(composer_data, csv_path, output_path, output_dir, run_id, taken, multi=False):
+    section = composer_data["section"]
+    if output_path:
+        path = output_path
+        if multi:
+            # Every section of a multi-section CSV gets its own suffix
+            base, ext = os.path.splitext(output_path)
+            grade = f"_G{composer_data['grade']}" if composer_data["grade"] else ""
+            path = f"{base}{grade}_{section}{ext}".replace(" ", "_")
+    else:
+        default_name = f"Attendance_{composer_data['month']}_{section}.xlsx".replace(" ", "_")
+        if output_dir:
+            path = os.path.join(output_dir, default_name)
+        else:
+            base, ext = os.path.splitext(default_name)
+            path = os.path.join(os.path.dirname(csv_path), f"{base}_{run_id}{ext}")
+        if path in taken and composer_data["grade"]:
+            # Same section name in another grade
+            base, ext = os.path.splitext(path)
+            path = f"{base}_G{composer_data['grade']}{ext}".replace(" ", "_")
+
+    base, ext = os.path.splitext(path)
+    n = 2
+    while path in taken:
+        path = f"{base}_{n}{ext}"
+        n += 1
+    taken.add(path)
+    return path
+
+def iter_sections(csv_path):
+    """
+    Streams the CSV and yields one processor-ready section dict (header keys,
+    dates, holidays, sorted students_male / students_female) at a time.
+    Rows are read once; a section is yielded when the next one starts or
+    the file ends. Raises ValueError if a section's rows are not contiguous.
+    """
+    info = {"school_name": "Unknown", "school_id": "", "school_year": "", "month": "", "grade": "", "section": ""}
+    columns = None
+    current = None
+    seen = set()
+
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            first = row[0].strip() if row else ""
+
+            # 1. Metadata lines (also start the next section of a school-wide export)
+            if first in METADATA_LABELS:
+                if current is not None:
+                    yield _finish_section(current)
+                    current = None
+                _read_metadata(row, info)
+                continue
+
+            # 2. Table header: resolve the columns once
+            if first == HEADER_FIRST:
+                if current is not None:
+                    yield _finish_section(current)
+                    current = None
+                columns = _resolve_columns(row)
+                if not columns["per_row_section"]:
+                    current = _start_section(info, columns, seen)
+                continue
+
+            if columns is None or len(row) < 2:
+                continue
+
+            # 3. Student rows
+            if columns["per_row_section"]:
+                grade, section = _row_section(row, columns, info)
+                if current is None or (current["grade"], current["section"]) != (grade, section):
+                    if current is not None:
+                        yield _finish_section(current)
+                    current = _start_section(dict(info, grade=grade, section=section), columns, seen)
+
+            student = _read_student(row, columns)
+            if student is not None:
+                current["students_male" if student.gender == "M" else "students_female"].append(student)
 
-    # Line 3
-    if len(all_rows) > 2:
-        row3 = all_rows[2]
+    if columns is None:
+        raise ValueError("Could not find header row starting with 'Student ID'")
+    if current is not None:
+        yield _finish_section(current)
+
+def _read_metadata(row, info):
+    cells = [cell.strip() for cell in row]
+
+    def value_after(label):
+        idx = cells.index(label)
+        return row[idx + 1] if idx + 1 < len(row) else ""
+
+    if LABEL_SCHOOL_NAME in cells:
+        info["school_name"] = value_after(LABEL_SCHOOL_NAME)
+    if LABEL_SCHOOL_ID in cells:
+        info["school_id"] = value_after(LABEL_SCHOOL_ID)
+    if LABEL_SCHOOL_YEAR in cells:
+        info["school_year"] = value_after(LABEL_SCHOOL_YEAR)
+    if LABEL_MONTH in cells:
+        month = value_after(LABEL_MONTH)
+        # If Month is "2026-02", convert to "February"
         try:
-            idx_gs = row3.index("Grade & Section:")
-            gs_val = row3[idx_gs + 1]
-            # Parse "Grade 10 - Agimat"
-            if "-" in gs_val:
-                parts = gs_val.split("-", 1)
-                school_info["grade"] = parts[0].replace("Grade", "").strip()
-                school_info["section"] = parts[1].strip()
-            else:
-                school_info["grade"] = gs_val
-                school_info["section"] = ""
+            month = datetime.datetime.strptime(month, "%Y-%m").strftime("%B")
         except ValueError:
-            school_info["grade"] = ""
-            school_info["section"] = ""
-
-    # 2. Find Header Row (Line 5 usually, starts with "Student ID")
-    header_row_idx = -1
-    for i, row in enumerate(all_rows):
-        if row and row[0] == "Student ID":
-            header_row_idx = i
-            break
-            
-    if header_row_idx == -1:
-        raise ValueError("Could not find header row starting with 'Student ID'")
+            pass # Keep as is if not YYYY-MM
+        info["month"] = month
+    if LABEL_GRADE_SECTION in cells:
+        info["grade"], info["section"] = _split_grade_section(value_after(LABEL_GRADE_SECTION))
+
+def _split_grade_section(value):
+    # Parse "Grade 10 - Agimat"
+    if "-" in value:
+        grade, section = value.split("-", 1)
+        return grade.replace("Grade", "").strip(), section.strip()
+    return value, ""
+
+def _resolve_columns(header):
+    """
+    Column positions of one table header: name/gender columns, optional
+    per-row section columns and the date columns (parsed once).
+    """
+    cells = [cell.strip() for cell in header]
+    positions = {name: i for i, name in reversed(list(enumerate(cells)))}
+
+    # Without all three name/gender headers, fall back to the standard layout
+    if all(name in positions for name in DEFAULT_COLUMNS):
+        name_cols = {name: positions[name] for name in DEFAULT_COLUMNS}
+    else:
+        name_cols = dict(DEFAULT_COLUMNS)
 
-    header = all_rows[header_row_idx]
-    
     # Identify Date Columns (YYYY-MM-DD)
+    dates = []
     date_cols = []
-    for i, col in enumerate(header):
+    for i, cell in enumerate(cells):
         try:
-            # Check format YYYY-MM-DD
-            datetime.datetime.strptime(col, "%Y-%m-%d")
-            date_cols.append(i)
+            datetime.datetime.strptime(cell, "%Y-%m-%d")
         except ValueError:
             continue
-            
+        dates.append(cell)
+        date_cols.append(i)
+
     if not date_cols:
         raise ValueError("No date columns (YYYY-MM-DD) found in header.")
 
-    # 3. Process Students
-    students_male = []
-    students_female = []
-    
-    start_date_idx = date_cols[0]
-    end_date_idx = date_cols[-1]
-    
-    # Store dates for the processor
-    dates_list = [header[i] for i in date_cols]
-    
-    for row in all_rows[header_row_idx + 1:]:
-        if not row or len(row) < 2:
-            continue
-            
-        # Structure: ID, Last, First, Gender, Dates...
-        # Indices might vary if CSV matches header exactly
-        try:
-            idx_last = header.index("Last Name")
-            idx_first = header.index("First Name")
-            idx_gender = header.index("Gender")
-        except ValueError:
-             # Fallback indices if headers missing?
-             # Assuming standard: 0=ID, 1=Last, 2=First, 3=Gender
-             idx_last = 1
-             idx_first = 2
-             idx_gender = 3
-             
-        name = f"{row[idx_last]}, {row[idx_first]}"
-        gender = row[idx_gender].strip().upper()
-        
-        attendance = {}
-        for col_idx in date_cols:
-            if col_idx < len(row):
-                val = row[col_idx].strip().upper()
-                date_str = header[col_idx]
-                
-                if val == "P":
-                    attendance[date_str] = "PRESENT"
-                elif val == "A":
-                    attendance[date_str] = "ABSENT"
-                # Ignore others
-        
-        student_obj = {
-            "name": name,
-            "attendance": attendance
-        }
-        
-        if gender == "MALE" or gender == "M":
-            students_male.append(student_obj)
-        elif gender == "FEMALE" or gender == "F":
-            students_female.append(student_obj)
-            
-    # Sort
-    students_male.sort(key=lambda x: x["name"])
-    students_female.sort(key=lambda x: x["name"])
-
-    # Prepare Data
-    composer_data = {
-        "school_name": school_info.get("school_name", ""),
-        "school_id": school_info.get("school_id", ""),
-        "school_year": school_info.get("school_year", ""),
-        "month": school_info.get("month", ""),
-        "grade": school_info.get("grade", ""),
-        "section": school_info.get("section", ""),
-        "dates": dates_list,
-        "holidays": set(), # CSV doesn't specify holidays, assume none or manual?
-        "students_male": students_male,
-        "students_female": students_female
+    grade_section = positions.get("Grade & Section")
+    section = positions.get("Section")
+    return {
+        "last": name_cols["Last Name"],
+        "first": name_cols["First Name"],
+        "gender": name_cols["Gender"],
+        "grade_section": grade_section,
+        "grade": positions.get("Grade"),
+        "section": section,
+        "per_row_section": grade_section is not None or section is not None,
+        "dates": dates,
+        "date_cols": date_cols,
     }
 
-    # Output Path
-    if not output_path:
-        default_name = f"Attendance_{composer_data['month']}_{composer_data['section']}.xlsx"
-        default_name = default_name.replace(" ", "_")
-        output_path = os.path.join(os.path.dirname(csv_path), default_name)
-    
-    # Check duplicate
-    if os.path.exists(output_path):
-         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-         base, ext = os.path.splitext(output_path)
-         output_path = f"{base}_{timestamp}{ext}"
+def _row_section(row, columns, info):
+    def cell(idx):
+        return row[idx].strip() if idx is not None and idx < len(row) else ""
 
-    # Template
-    template = os.path.join(os.getcwd(), "sf2-template", "SF2Template.xlsx")
-    
-    print(f"Generating report for {composer_data['school_name']}...")
-    processor.save_to_excel(composer_data, template, output_path)
-    print(f"Successfully saved to: {output_path}")
-    return output_path
+    if columns["grade_section"] is not None:
+        return _split_grade_section(cell(columns["grade_section"]))
+    grade = cell(columns["grade"]) if columns["grade"] is not None else info["grade"]
+    return grade, cell(columns["section"])
+
+def _read_student(row, columns):
+    """
+    One Student from a table row, or None when the gender is not M/F.
+    """
+    gender = row[columns["gender"]].strip().upper() if columns["gender"] < len(row) else ""
+    if gender in ("MALE", "M"):
+        gender = "M"
+    elif gender in ("FEMALE", "F"):
+        gender = "F"
+    else:
+        return None
+
+    last = row[columns["last"]] if columns["last"] < len(row) else ""
+    first = row[columns["first"]] if columns["first"] < len(row) else ""
+
+    # Absences go straight into the bitmask (bit = position in the dates);
+    # "P" and anything else count as present
+    absent = 0
+    for ordinal, col_idx in enumerate(columns["date_cols"]):
+        if col_idx < len(row) and row[col_idx].strip().upper() == "A":
+            absent |= 1 << ordinal
+    return Student(f"{last}, {first}", gender, absent, columns["dates"])
+
+def _start_section(info, columns, seen):
+    key = (info["grade"], info["section"], info["month"])
+    if key in seen:
+        raise ValueError(f"Rows of Grade {key[0]} - {key[1]} ({key[2]}) are not contiguous; "
+                         "group the CSV export by section")
+    seen.add(key)
+
+    section = {key: info[key] for key in ("school_name", "school_id", "school_year", "month", "grade", "section")}
+    section.update({
+        "dates": columns["dates"],
+        "holidays": set(), # CSV doesn't specify holidays, assume none or manual?
+        "students_male": [],
+        "students_female": [],
+    })
+    return section
+
+def _finish_section(section):
+    # Sort
+    section["students_male"].sort(key=lambda x: x.name)
+    section["students_female"].sort(key=lambda x: x.name)
+    return section
@@ -0,0 +1,185 @@
+"""
+Long-lived SF2 render daemon.
+
+Keeps the interpreter, openpyxl and the parsed template warm so callers
+(e.g. server.js) do not pay for a fresh `main.py --json` process per
+export. Speaks JSON-lines: one request object per line in, one response
+object per line out.
+
+Request:
+    {"id": 1, "payload": {...SF2 JSON...}, "force_split": false,
+     "engine": "xml", "values": "cached", "output_dir": "/tmp/run-1"}
+    - payload:     single section or bundle, same schema as --json
+    - force_split: same as --force-yes (default false)
+    - engine:      optional, overrides SF2_ENGINE
+    - values:      optional, overrides SF2_VALUES (formulas, cached, values)
+    - output_dir:  optional; write the .xlsx files there and return paths.
+                   Without it the files are returned base64-encoded.
+
+Response:
+    {"id": 1, "ok": true, "elapsed_ms": 12.3,
+     "files": [{"name": "...xlsx", "size": 16129, "path": "..."} or "data": "<base64>"]}
+    {"id": 1, "ok": false, "error": "...", "details": [...]}
+
+Control messages: {"op": "ping"}, {"op": "stats"}, {"op": "shutdown"}.
+"""
+import base64
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+def warm_up(engine=None):
+    """
+    Imports the rendering stack and parses the template before the first
+    request arrives.
+    """
+    from . import json_processor, processor
+    template = json_processor._template_path()
+    if os.path.exists(template):
+        processor.preload_template(template, engine=engine)
+        log(f"Template preloaded: {template}")
+    else:
+        log(f"Template not found yet: {template}")
+
+def log(message):
+    # stdout carries the protocol, so all diagnostics go to stderr.
+    print(f"[sf2-daemon] {message}", file=sys.stderr, flush=True)
+
+def handle_request(message):
+    """
+    Processes one decoded request and returns the response dict.
+    """
+    from . import payload, guardrails, json_processor, processor, result_cache
+
+    if not isinstance(message, dict):
+        return {"ok": False, "error": "Request must be a JSON object"}
+
+    response = {"id": message.get("id")}
+    op = message.get("op", "render")
+
+    if op in ("ping", "shutdown"):
+        response.update({"ok": True, "pid": os.getpid()})
+        return response
+    if op == "stats":
+        response.update({
+            "ok": True,
+            "results": result_cache.get_cache_stats(),
+            "template": processor.get_template_cache_stats(),
+        })
+        return response
+    if op != "render":
+        response.update({"ok": False, "error": f"Unknown op: {op}"})
+        return response
+
+    started = time.perf_counter()
+    try:
+        # 1. Validate
+        parsed = payload.parse(message.get("payload"))
+        if not parsed.is_valid:
+            response.update({"ok": False, "error": "Invalid attendance data", "details": parsed.errors})
+            return response
+
+        force_split = bool(message.get("force_split", False))
+        guardrails.enforce_student_limits(parsed, force_split=force_split)
+
+        # 2. Render
+        output_dir = message.get("output_dir")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        files = []
+        for name, buf in json_processor.iter_rendered_parts(parsed, force_split=force_split,
+                                                            engine=message.get("engine"),
+                                                            values=message.get("values")):
+            data = buf.getvalue()
+            entry = {"name": name, "size": len(data)}
+            if output_dir:
+                path = os.path.join(output_dir, name)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                entry["path"] = os.path.abspath(path)
+            else:
+                entry["data"] = base64.b64encode(data).decode("ascii")
+            files.append(entry)
+
+        response.update({"ok": True, "files": files})
+    except Exception as e:
+        response.update({"ok": False, "error": str(e)})
+
+    response["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return response
+
+def _handle_line(line):
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        return {"ok": False, "error": f"Invalid JSON: {e}"}, False
+    response = handle_request(message)
+    return response, isinstance(message, dict) and message.get("op") == "shutdown"
+
+def serve_stdio(engine=None):
+    """
+    Reads requests from stdin and writes responses to stdout until EOF or
+    a shutdown message.
+    """
+    out = sys.stdout
+    # Anything the processors print must not corrupt the protocol stream.
+    sys.stdout = sys.stderr
+
+    warm_up(engine)
+    log("Ready (stdio).")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        response, shutdown = _handle_line(line)
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+        if shutdown:
+            break
+
+    log("Stopped.")
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            response, shutdown = _handle_line(raw.decode("utf-8"))
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if shutdown:
+                # shutdown() blocks until serve_forever returns, so it cannot
+                # run on the serving thread.
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def serve_unix(path, engine=None):
+    """
+    Listens on a Unix domain socket; every connection may send any number
+    of requests, one per line.
+    """
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        raise OSError("Unix domain sockets are not supported on this platform")
+
+    sys.stdout = sys.stderr
+    if os.path.exists(path):
+        os.unlink(path)
+
+    warm_up(engine)
+    with _UnixServer(path, _LineHandler) as server:
+        log(f"Ready (unix socket {path}).")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+    log("Stopped.")
@@ -1,5 +1,4 @@
-import json
-import os
+from . import payload
 
 class StudentLimitExceeded(Exception):
     """Exception raised when student count exceeds template limits."""
@@ -8,37 +7,29 @@ class StudentLimitExceeded(Exception):
 def validate_student_count(file_path, force_split=False):
     """
     Validates that the provided JSON file does not contain more than 
-    30 male or 30 female students. Raises StudentLimitExceeded if it exceeds 
-    limits AND force_split=False. If force_split is True, just prints a warning.
+    30 male or 30 female students (per section for bundle files). Raises 
+    StudentLimitExceeded if it exceeds limits AND force_split=False. 
+    If force_split is True, just prints a warning.
     """
-    if not os.path.exists(file_path):
-        return  # Let the processor handle missing file scenarios
-        
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        parsed = payload.load(file_path)
     except Exception:
-        return  # Let the processor handle JSON decode errors
+        return  # Let the processor handle missing file / JSON decode errors
 
-    students = data.get("students", [])
-    if not isinstance(students, list):
-        return
-        
-    male_count = 0
-    female_count = 0
+    enforce_student_limits(parsed, force_split=force_split)
 
-    for s in students:
-        if not isinstance(s, dict):
-            continue
-        gender = s.get("gender", "M").upper()
-        if gender in ("M", "MALE"):
-            male_count += 1
-        elif gender in ("F", "FEMALE"):
-            female_count += 1
+def enforce_student_limits(parsed, force_split=False):
+    """
+    Same check as validate_student_count, on an already parsed payload
+    (payload.ParsedPayload), so the file is not read again.
+    """
+    for label, male_count, female_count in parsed.counts:
+        _check_counts(male_count, female_count, force_split, f" ({label})" if label else "")
 
+def _check_counts(male_count, female_count, force_split, label=""):
     if male_count > 30 or female_count > 30:
         if force_split:
-            print(f"[WARNING] Student limits exceeded ({male_count} M / {female_count} F). Auto-splitting enabled via --force-yes.")
+            print(f"[WARNING] Student limits exceeded{label} ({male_count} M / {female_count} F). Auto-splitting enabled via --force-yes.")
             return
 
         msg = f"""
@@ -46,7 +37,7 @@ def validate_student_count(file_path, force_split=False):
 [GUARDRAIL ALERT] STUDENT LIMIT EXCEEDED
 ========================================================================
 
-The provided JSON file contains {male_count} male(s) and {female_count} female(s).
+The provided JSON file{label} contains {male_count} male(s) and {female_count} female(s).
 
 The standard DepEd SF2 Excel template ONLY accommodates:
 - Max 30 Male students
@@ -1,96 +1,29 @@
+import io
 import json
 import os
-import datetime
+import time
+import zipfile
 from . import processor
+from . import payload
+from . import result_cache
 
 def load_json(file_path):
     """
     Loads and validates the JSON file.
+    Accepts a single section ("school_info" + "students") or a bundle ("sections").
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"JSON file not found: {file_path}")
-        
-    try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON format: {e}")
-        
-    # Basic Validation
-    required_keys = ["school_info", "students"]
-    for key in required_keys:
-        if key not in data:
-            raise ValueError(f"Missing required key in JSON: {key}")
-            
-    return data
+    parsed = payload.load(file_path)
+    parsed.raise_for_errors()
+    return parsed.data
 
-def process_json_to_excel(json_path, output_path=None, force_split=False):
+def split_parts(section, force_split=False):
     """
-    Reads JSON, processes data, and saves to Excel using processor.save_to_excel.
+    Splits one normalized section (see payload.parse) into report parts.
+    Returns a list of processor-ready dicts (one per output workbook).
     """
-    data = load_json(json_path)
-    
-    school_info = data.get("school_info", {})
-    students = data.get("students", [])
-    holidays = set(data.get("holidays", []))
-    
-    # helper for keys
-    # JSON keys might differ slightly from processor expectations, let's map them.
-    # processor expects: school_name, school_id, school_year, month, grade, section
-    
-    # valid fields in school_info
-    required_info = ["school_name", "school_id", "school_year", "month", "grade", "section"]
-    composer_data = {}
-    
-    for key in required_info:
-        if key not in school_info:
-             # Try simple mapping if user used shorter keys? 
-             # For now enforce strict keys or map specific ones if needed.
-             # schema in plan used "name", "id", "year". mapping them:
-             mapping = {"school_name": "name", "school_id": "id", "school_year": "year"}
-             alt_key = mapping.get(key)
-             if alt_key and alt_key in school_info:
-                 composer_data[key] = school_info[alt_key]
-             else:
-                 # Default to empty or raise error? Let's raise for now to be safe.
-                 # Actually, let's just warn or use empty string to avoid crashing hard on minor things.
-                 composer_data[key] = ""
-        else:
-            composer_data[key] = school_info[key]
-
-    # Calculate Dates
-    try:
-        dates = processor.get_weekdays_in_month(
-            composer_data["school_year"], composer_data["month"]
-        )
-        composer_data["dates"] = dates
-    except Exception as e:
-        raise ValueError(f"Date Calculation Error: {str(e)}")
-
-    composer_data["holidays"] = holidays
-
-    # Process Students
-    students_male = []
-    students_female = []
-    
-    for s in students:
-        s_name = s.get("name", "Unknown")
-        s_gender = s.get("gender", "M").upper()
-        s_att = s.get("attendance", {})
-        
-        student_obj = {
-            "name": s_name,
-            "attendance": s_att
-        }
-        
-        if s_gender == "M" or s_gender == "MALE":
-            students_male.append(student_obj)
-        else:
-            students_female.append(student_obj)
-            
-    # Sort
-    students_male.sort(key=lambda x: x["name"])
-    students_female.sort(key=lambda x: x["name"])
+    students_male = section["students_male"]
+    students_female = section["students_female"]
+    composer_data = {k: v for k, v in section.items() if k not in ("students_male", "students_female")}
 
     # Splitting Logic
     def chunk_list(lst, n):
@@ -109,42 +42,310 @@ def process_json_to_excel(json_path, output_path=None, force_split=False):
         female_chunks = [students_female[:30]]
         num_parts = 1
 
-    generated_paths = []
-    
+    parts = []
     for i in range(num_parts):
-        part_males = male_chunks[i] if i < len(male_chunks) else []
-        part_females = female_chunks[i] if i < len(female_chunks) else []
-        
         part_data = composer_data.copy()
-        part_data["students_male"] = part_males
-        part_data["students_female"] = part_females
-        
-        # Determine output path for this part
-        current_output_path = output_path
-        if not current_output_path:
-            # Generate default
-            suffix = f"_pt{i+1}" if num_parts > 1 else ""
-            default_name = f"Attendance_{composer_data['month']}_{composer_data['section']}{suffix}.xlsx"
-            default_name = default_name.replace(" ", "_")
-            current_output_path = os.path.join(os.path.dirname(json_path), default_name)
-        else:
-            if num_parts > 1:
-                base, ext = os.path.splitext(current_output_path)
-                current_output_path = f"{base}_pt{i+1}{ext}"
-                
-        # Check duplicate
-        if os.path.exists(current_output_path):
-             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-             base, ext = os.path.splitext(current_output_path)
-             current_output_path = f"{base}_{timestamp}{ext}"
-
-        # Template
-        # Assuming template is in current working directory/sf2-template/
-        template = os.path.join(os.getcwd(), "sf2-template", "SF2Template.xlsx")
-        
-        print(f"Generating report part {i+1}/{num_parts} for {composer_data['school_name']}...")
-        processor.save_to_excel(part_data, template, current_output_path)
-        print(f"Successfully saved to: {current_output_path}")
-        generated_paths.append(current_output_path)
-        
-    return generated_paths
+        part_data["students_male"] = male_chunks[i] if i < len(male_chunks) else []
+        part_data["students_female"] = female_chunks[i] if i < len(female_chunks) else []
+        parts.append(part_data)
+    return parts
+
+def _default_output_path(part_data, output_dir, part_idx, num_parts, include_grade=False):
+    suffix = f"_pt{part_idx+1}" if num_parts > 1 else ""
+    grade = f"_G{part_data['grade']}" if include_grade and part_data.get("grade") else ""
+    default_name = f"Attendance_{part_data['month']}{grade}_{part_data['section']}{suffix}.xlsx"
+    default_name = default_name.replace(" ", "_")
+    return os.path.join(output_dir, default_name)
+
+def _run_output_path(path, run_id):
+    # Outputs written next to the input carry the run id, so concurrent runs
+    # never collide and the name is known without probing the disk.
+    base, ext = os.path.splitext(path)
+    return f"{base}_{run_id}{ext}"
+
+def _dedupe(path, taken):
+    base, ext = os.path.splitext(path)
+    n = 2
+    while path in taken:
+        path = f"{base}_{n}{ext}"
+        n += 1
+    taken.add(path)
+    return path
+
+def _template_path():
+    # Template
+    # Assuming template is in current working directory/sf2-template/
+    return os.path.join(os.getcwd(), "sf2-template", "SF2Template.xlsx")
+
+def _render_task(task):
+    """
+    Renders one report part. Top-level so it can run in a process pool.
+    """
+    part_data, template, output_path, engine, values, label = task
+    print(f"Generating report {label} for {part_data['school_name']}...")
+    started = time.perf_counter()
+    data = render_part(part_data, template, engine, values=values)
+    rendered = time.perf_counter()
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    print(f"Successfully saved to: {output_path}")
+    return {
+        "path": output_path,
+        "bytes": len(data),
+        "render_ms": round((rendered - started) * 1000, 2),
+        "write_ms": round((time.perf_counter() - rendered) * 1000, 2),
+    }
+
+def render_part(part_data, template, engine, key=None, values=None):
+    """
+    Renders one report part to .xlsx bytes. Parts rendered before (same
+    normalized data, template contents, engine and value mode) come from
+    result_cache.
+    """
+    if not os.path.exists(template):
+        raise FileNotFoundError(f"Template not found: {template}")
+    values = processor.resolve_value_mode(values, engine)
+
+    cache = result_cache.get_cache()
+    if cache.enabled:
+        key = key or result_cache.part_key(part_data, template, engine, values=values)
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    buf = io.BytesIO()
+    processor.save_to_excel(part_data, template, buf, engine=engine, values=values)
+    data = buf.getvalue()
+
+    if cache.enabled:
+        cache.put(key, data)
+    return data
+
+def _run_tasks(tasks, jobs=1):
+    """
+    Renders tasks in order, or across a process pool when jobs > 1.
+    Returns one {path, bytes, render_ms, write_ms} dict per task, in order.
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return [_render_task(task) for task in tasks]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        return list(pool.map(_render_task, tasks))
+
+def process_json_to_excel(json_path, output_path=None, force_split=False, jobs=1, output_dir=None, run_id=None):
+    """
+    Reads JSON, processes data, and saves to Excel using processor.save_to_excel.
+    Bundle payloads are routed to process_bundle_to_excel.
+    """
+    parsed = payload.load(json_path)
+    parsed.raise_for_errors()
+    return process_parsed_to_excel(parsed, output_path=output_path, force_split=force_split, jobs=jobs,
+                                   output_dir=output_dir, run_id=run_id)
+
+def process_parsed_to_excel(parsed, output_path=None, force_split=False, jobs=1, output_dir=None, run_id=None):
+    """
+    Renders an already validated payload.ParsedPayload (no re-parsing).
+    Returns the output paths.
+    """
+    if parsed.is_bundle:
+        manifest = process_bundle_to_excel(parsed.source or "", output_dir=output_dir, force_split=force_split,
+                                           jobs=jobs, parsed=parsed, run_id=run_id)
+    else:
+        manifest = write_reports(parsed, output_path=output_path, output_dir=output_dir,
+                                 force_split=force_split, jobs=jobs, run_id=run_id)
+    return [entry["path"] for entry in manifest["outputs"]]
+
+def write_reports(parsed, output_path=None, output_dir=None, force_split=False, jobs=1, run_id=None):
+    """
+    Renders every part of a validated payload to disk and returns a manifest:
+    run id, engine, value mode, one entry per output (path, section, part, counts, bytes,
+    timings) and stage timings.
+
+    Naming is deterministic, with no existence checks:
+    - output_dir: files are named Attendance_<month>[_G<grade>]_<section>[_ptN].xlsx
+      inside it (the caller gives each run its own directory);
+    - output_path (single section only): used as-is, with _ptN for split parts;
+    - otherwise: next to the input, with the run id appended to each name.
+    """
+    started = time.perf_counter()
+    run_id = run_id or processor.new_run_id()
+    source = parsed.source or ""
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        target_dir = output_dir
+    else:
+        target_dir = os.path.dirname(source)
+
+    engine = processor.resolve_engine()
+    values = processor.resolve_value_mode(engine=engine)
+    template = _template_path()
+    taken = set()
+    tasks = []
+    entries = []
+
+    sections = parsed.sections
+    for s_idx, section in enumerate(sections):
+        parts = split_parts(section, force_split=force_split)
+        num_parts = len(parts)
+        for p_idx, part_data in enumerate(parts):
+            # Determine output path for this part
+            if output_path and not parsed.is_bundle:
+                path = output_path
+                base, ext = os.path.splitext(path)
+                if len(sections) > 1:
+                    # Yearly payload: one file per month
+                    base = f"{base}_{part_data['month']}"
+                    path = f"{base}{ext}"
+                if num_parts > 1:
+                    path = f"{base}_pt{p_idx+1}{ext}"
+            else:
+                path = _default_output_path(part_data, target_dir, p_idx, num_parts, include_grade=parsed.is_bundle)
+                if not output_dir:
+                    path = _run_output_path(path, run_id)
+            path = _dedupe(path, taken)
+
+            if parsed.is_bundle:
+                label = f"section {s_idx+1}/{len(sections)} part {p_idx+1}/{num_parts}"
+            elif len(sections) > 1:
+                label = f"{part_data['month']} part {p_idx+1}/{num_parts}"
+            else:
+                label = f"part {p_idx+1}/{num_parts}"
+            tasks.append((part_data, template, path, engine, values, label))
+            entries.append({
+                "section_index": s_idx,
+                "grade": part_data.get("grade", ""),
+                "section": part_data.get("section", ""),
+                "month": part_data.get("month", ""),
+                "part": p_idx + 1,
+                "parts": num_parts,
+                "male_count": len(part_data["students_male"]),
+                "female_count": len(part_data["students_female"]),
+                "path": path,
+            })
+
+    planned = time.perf_counter()
+    results = _run_tasks(tasks, jobs)
+    for entry, result in zip(entries, results):
+        entry.update(result)
+
+    return {
+        "run_id": run_id,
+        "source": source,
+        "output_dir": target_dir,
+        "sections": len(sections),
+        "jobs": jobs,
+        "engine": engine,
+        "values": values,
+        "outputs": entries,
+        "timings": {
+            "plan_ms": round((planned - started) * 1000, 2),
+            "render_ms": round((time.perf_counter() - planned) * 1000, 2),
+        },
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+def process_bundle_to_excel(json_path, output_dir=None, force_split=False, jobs=1, parsed=None, run_id=None):
+    """
+    Renders every section of a bundle payload, optionally across `jobs`
+    worker processes. Returns a manifest dict and writes it next to the outputs
+    as <bundle>_manifest.json (<bundle>_<run id>_manifest.json when the
+    outputs share the input's directory; <bundle> is "stdin" for "-").
+    """
+    if parsed is None:
+        parsed = payload.load(json_path)
+        parsed.raise_for_errors()
+
+    manifest = write_reports(parsed, output_dir=output_dir, force_split=force_split, jobs=jobs, run_id=run_id)
+
+    if json_path == payload.STDIN_PATH:
+        # Read from standard input: no file name to derive the manifest's from
+        base = "stdin"
+    else:
+        base = os.path.splitext(os.path.basename(json_path))[0]
+    if not output_dir:
+        base = f"{base}_{manifest['run_id']}"
+    manifest_path = os.path.join(manifest["output_dir"], f"{base}_manifest.json")
+    manifest["manifest_path"] = manifest_path
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    print(f"Generated {len(manifest['outputs'])} report(s) for {manifest['sections']} section(s) "
+          f"in {os.path.abspath(manifest['output_dir'] or os.curdir)}. Manifest: {manifest_path}")
+    return manifest
+
+def plan_rendered_parts(parsed, force_split=False, engine=None, values=None):
+    """
+    Lists the parts iter_rendered_parts would produce without rendering them:
+    dicts with the file "name", the part "data" and its result_cache "key".
+    """
+    engine = processor.resolve_engine(engine)
+    values = processor.resolve_value_mode(values, engine)
+    template = _template_path()
+    if not os.path.exists(template):
+        raise FileNotFoundError(f"Template not found: {template}")
+    taken = set()
+    plan = []
+
+    for section in parsed.sections:
+        parts = split_parts(section, force_split=force_split)
+        for i, part_data in enumerate(parts):
+            name = _default_output_path(part_data, "", i, len(parts), include_grade=parsed.is_bundle)
+            name = _dedupe(name, taken)
+            plan.append({
+                "name": name,
+                "data": part_data,
+                "key": result_cache.part_key(part_data, template, engine, values=values),
+                "template": template,
+                "engine": engine,
+                "values": values,
+            })
+    return plan
+
+def iter_rendered_parts(parsed, force_split=False, engine=None, plan=None, values=None):
+    """
+    Renders a validated payload.ParsedPayload entirely in memory.
+    Yields (file_name, BytesIO) for each report part as soon as it is done;
+    nothing is written to disk (other than the optional result cache).
+    Pass a plan from plan_rendered_parts to avoid building it twice.
+    """
+    if plan is None:
+        plan = plan_rendered_parts(parsed, force_split=force_split, engine=engine, values=values)
+
+    for part in plan:
+        data = render_part(part["data"], part["template"], part["engine"], key=part["key"], values=part["values"])
+        yield part["name"], io.BytesIO(data)
+
+def write_to_stream(parsed, stream, force_split=False, engine=None, values=None):
+    """
+    Writes the rendered reports to a binary stream (e.g. stdout): the .xlsx
+    itself when there is a single part, otherwise a ZIP of all parts (stored,
+    as .xlsx files are already compressed). Returns the part file names.
+    """
+    plan = plan_rendered_parts(parsed, force_split=force_split, engine=engine, values=values)
+    parts = iter_rendered_parts(parsed, plan=plan)
+
+    if len(plan) == 1:
+        name, buf = next(parts)
+        stream.write(buf.getbuffer())
+        print(f"Successfully wrote {name} to output stream")
+        return [name]
+
+    names = []
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as zf:
+        for name, buf in parts:
+            zf.writestr(name, buf.getbuffer())
+            names.append(name)
+            print(f"Added {name} to output archive")
+    return names
+
+def render_payload(data, force_split=False, engine=None, values=None):
+    """
+    In-memory entry point: takes an already-decoded payload dict (single
+    section or bundle) and returns a list of (file_name, BytesIO) workbooks.
+    Raises ValueError if the payload does not validate.
+    """
+    parsed = payload.parse(data)
+    parsed.raise_for_errors()
+    return list(iter_rendered_parts(parsed, force_split=force_split, engine=engine, values=values))
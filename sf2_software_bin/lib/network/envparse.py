@@ -2,28 +2,70 @@ import os
 import logging
 from dotenv import load_dotenv
 
-# Setup centralized logging
-os.makedirs("logs", exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("logs/server_history.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger("sf2_server")
+_logging_ready = False
+
+def setup_logging():
+    """
+    Sets up centralized logging (console + logs/server_history.log).
+    Called by load_or_create_env rather than at import time, so importing
+    this module does not create directories or open files. Safe to call
+    more than once.
+    """
+    global _logging_ready
+    if _logging_ready:
+        return
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.FileHandler("logs/server_history.log"),
+            logging.StreamHandler()
+        ]
+    )
+    _logging_ready = True
 
 ENV_FILE = ".env"
 
+# How /gen-sf2 packages its reports:
+#   stored   - ZIP without recompression (.xlsx parts are already deflated)
+#   deflated - ZIP with deflate applied again
+#   single   - raw .xlsx when only one part was produced, stored ZIP otherwise
+ARCHIVE_MODES = ("stored", "deflated", "single")
+DEFAULT_ARCHIVE_MODE = "stored"
+
+# Rendered report cache (read by lib.result_cache from the environment)
+CACHE_DEFAULTS = {
+    "SF2_CACHE_DIR": "cache", # Disk tier directory; empty disables it
+    "SF2_CACHE_MEMORY_MB": "64", # Memory tier size per server process; 0 disables it
+    "SF2_CACHE_DISK_MB": "512", # Disk tier size
+}
+
+# Background job API (/jobs/...)
+JOB_DEFAULTS = {
+    "JOBS_DIR": "jobs", # Where job status and results are kept
+    "JOB_WORKERS": "1", # Jobs rendered at the same time per server process
+    "JOB_QUEUE": "16", # Max jobs waiting or running per server process
+    "JOB_TIMEOUT": "600", # Seconds a job may run before it is failed
+    "JOB_TTL": "3600", # Seconds finished jobs are kept for download
+}
+
 def load_or_create_env():
     """Reads .env properties. If missing, auto-generates with defaults."""
+    setup_logging()
     if not os.path.exists(ENV_FILE):
         logger.info(f"No {ENV_FILE} found. Auto-generating defaults.")
         default_config = {
             "HOST": "0.0.0.0",
             "PORT": "5000",
             "MODE": "HEADLESS", # Can be HEADLESS, TUI, or GUI
+            "ARCHIVE_MODE": DEFAULT_ARCHIVE_MODE, # Can be stored, deflated, or single
+            "WORKERS": "1", # Worker processes for headless mode; "auto" = one per CPU
+            "THREADS": "4", # Request threads per worker
+            "BACKLOG": "128", # Listen queue length of the shared socket
+            **JOB_DEFAULTS,
+            **CACHE_DEFAULTS,
         }
         _write_env(default_config)
 
@@ -32,9 +74,32 @@ def load_or_create_env():
     return {
         "HOST": os.environ.get("HOST", "0.0.0.0"),
         "PORT": os.environ.get("PORT", "5000"),
-        "MODE": os.environ.get("MODE", "HEADLESS")
+        "MODE": os.environ.get("MODE", "HEADLESS"),
+        "ARCHIVE_MODE": resolve_archive_mode(),
+        "WORKERS": os.environ.get("WORKERS", "1"),
+        "THREADS": os.environ.get("THREADS", "4"),
+        "BACKLOG": os.environ.get("BACKLOG", "128"),
+        **get_job_config(),
+        **{k: os.environ.get(k, v) for k, v in CACHE_DEFAULTS.items()}
     }
 
+def get_job_config():
+    """Job API settings from the environment, falling back to JOB_DEFAULTS."""
+    return {k: os.environ.get(k, v) for k, v in JOB_DEFAULTS.items()}
+
+def resolve_archive_mode(mode=None):
+    """
+    Returns the archive mode for /gen-sf2 responses: the given value, else
+    ARCHIVE_MODE from the environment, else the default. Unknown values are
+    logged and replaced by the default so a typo in .env cannot take the
+    server down.
+    """
+    mode = (mode or os.environ.get("ARCHIVE_MODE") or DEFAULT_ARCHIVE_MODE).strip().lower()
+    if mode not in ARCHIVE_MODES:
+        logger.warning(f"Unknown ARCHIVE_MODE '{mode}'. Falling back to '{DEFAULT_ARCHIVE_MODE}'.")
+        return DEFAULT_ARCHIVE_MODE
+    return mode
+
 def update_env(updates):
     """Updates the .env file with a dictionary of new key-value pairs."""
     # Read existing
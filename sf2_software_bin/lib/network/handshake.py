@@ -1,12 +1,18 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
+import itertools
 import os
-import tempfile
-import json
 import zipfile
 import io
 from lib import json_processor
+from lib import processor
+from lib import result_cache
+from lib import payload as payload_mod
+from lib.network import envparse
+from lib.network import jobs
 from lib.network.envparse import logger
 
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 app = Flask(__name__)
 
 @app.route('/gen-sf2', methods=['POST'])
@@ -22,47 +28,60 @@ def handle_ping():
     payload = request.get_json()
     logger.info(f"Received JSON Handshake payload from {request.remote_addr}")
 
-    # Write payload to a temporary file for the existing json_processor logic
+    # Render straight from the decoded payload; no temp files are involved.
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp:
-            json.dump(payload, tmp)
-            tmp_path = tmp.name
+        parsed = payload_mod.parse(payload)
+        if not parsed.is_valid:
+            logger.warning(f"Rejected invalid payload from {request.remote_addr}: {parsed.errors}")
+            return jsonify({
+                "error": "Invalid attendance data",
+                "details": parsed.errors
+            }), 400
 
-        logger.info(f"Processing JSON payload mapped to {tmp_path}")
-        
         # We always set force_split to True for Server logic to avoid sudden aborts 
         # crashing a completely automated workflow.
-        generated_files = json_processor.process_json_to_excel(tmp_path, force_split=True)
-        
-        # Clean up tmp file
-        os.remove(tmp_path)
-        
-        logger.info(f"Successfully generated {len(generated_files)} report(s). Packaging into ZIP...")
-        
-        # Package files into a ZIP archive in memory
-        memory_file = io.BytesIO()
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for file_path in generated_files:
-                zf.write(file_path, os.path.basename(file_path))
-        
-        # Reset memory file pointer to the beginning
-        memory_file.seek(0)
-        
-        # Clean up generated files on the server to save space
-        for file_path in generated_files:
-            try:
-                os.remove(file_path)
-            except OSError:
-                pass
-                
-        logger.info("Sending ZIP payload back to client.")
-        
-        return send_file(
-            memory_file,
+        plan = json_processor.plan_rendered_parts(parsed, force_split=True)
+        archive_mode = envparse.resolve_archive_mode()
+
+        # Identical payload + template + archive mode => equivalent response, so
+        # the content address doubles as the ETag. It is weak: the bytes are
+        # not reproducible (zip and docProps timestamps), so byte ranges of
+        # two renders must never be combined.
+        etag = result_cache.combined_key([part["key"] for part in plan], archive_mode)
+        if request.if_none_match.contains_weak(etag):
+            logger.info(f"Client copy of {etag[:12]} is current (304).")
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        parts = json_processor.iter_rendered_parts(parsed, plan=plan)
+
+        # Render the first part up front so setup failures (missing template,
+        # bad dates) still produce a proper JSON error instead of a cut stream.
+        head = [part for part in [next(parts, None)] if part is not None]
+
+        if archive_mode == "single" and len(plan) == 1:
+            # A lone report goes out as a plain .xlsx.
+            file_name, buf = head[0]
+            logger.info(f"Sending single report {file_name} without an archive.")
+            response = send_file(buf, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=file_name,
+                                 etag=False, conditional=False)
+            response.set_etag(etag, weak=True)
+            return response
+
+        # .xlsx parts are already deflate-compressed, so only "deflated"
+        # compresses them again.
+        compression = zipfile.ZIP_DEFLATED if archive_mode == "deflated" else zipfile.ZIP_STORED
+
+        logger.info(f"Streaming ZIP payload ({archive_mode}) back to client as reports are rendered.")
+
+        response = Response(
+            _stream_zip(head, parts, compression, request.remote_addr),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name='Attendance_Reports.zip'
+            headers={"Content-Disposition": "attachment; filename=Attendance_Reports.zip"}
         )
+        response.set_etag(etag, weak=True)
+        return response
 
     except Exception as e:
         logger.error(f"Error processing JSON Handshake: {e}")
@@ -71,6 +90,119 @@ def handle_ping():
             "details": str(e)
         }), 500
 
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only, non-seekable buffer for zipfile. zipfile falls back to data
+    descriptors on non-seekable streams, so finished bytes can be handed to
+    the client straight away.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _stream_zip(head, parts, compression, remote_addr):
+    """
+    Yields the ZIP archive chunk by chunk: each report is added (and sent)
+    as soon as it has been rendered, so only one part is held in memory.
+    """
+    sink = _ChunkSink()
+    count = 0
+    try:
+        with zipfile.ZipFile(sink, 'w', compression) as zf:
+            for file_name, buf in itertools.chain(head, parts):
+                zf.writestr(file_name, buf.getbuffer())
+                buf.close()
+                count += 1
+                yield sink.drain()
+        # Central directory
+        yield sink.drain()
+        logger.info(f"Successfully streamed {count} report(s) to {remote_addr}.")
+    except Exception as e:
+        # Headers are already sent; the client will see a truncated archive.
+        logger.error(f"Error while streaming reports to {remote_addr} after {count} part(s): {e}")
+        raise
+
+@app.route('/jobs/gen-sf2', methods=['POST'])
+def submit_job():
+    """
+    Queues an SF2 generation job and returns immediately (HTTP 202).
+    Poll /jobs/<id> for progress and fetch /jobs/<id>/result when done.
+    """
+    if not request.is_json:
+        logger.warning(f"Rejected non-JSON job from {request.remote_addr}")
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    parsed = payload_mod.parse(request.get_json())
+    if not parsed.is_valid:
+        logger.warning(f"Rejected invalid job payload from {request.remote_addr}: {parsed.errors}")
+        return jsonify({
+            "error": "Invalid attendance data",
+            "details": parsed.errors
+        }), 400
+
+    try:
+        status = jobs.get_manager().submit(parsed, envparse.resolve_archive_mode())
+    except jobs.JobQueueFull as e:
+        logger.warning(f"Rejected job from {request.remote_addr}: {e}")
+        return jsonify({"error": "Server busy", "details": str(e)}), 503
+
+    job_url = f"/jobs/{status['id']}"
+    status.update({"status_url": job_url, "result_url": f"{job_url}/result"})
+    return jsonify(status), 202, {"Location": job_url}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Returns the state and progress of a job."""
+    status = jobs.get_manager().status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Downloads the result of a finished job (409 while it is not done)."""
+    manager = jobs.get_manager()
+    status = manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    path = manager.result_path(job_id)
+    if path is None:
+        return jsonify({"error": f"Job is {status['state']}", "status": status}), 409
+
+    return send_file(os.path.abspath(path), mimetype=status["result_mimetype"],
+                     as_attachment=True, download_name=status["result_name"])
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancels a pending job, or deletes a finished job and its result."""
+    status = jobs.get_manager().cancel(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status), 200 if status["state"] == "deleted" else 202
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters of this server process's caches."""
+    return jsonify({
+        "pid": os.getpid(),
+        "results": result_cache.get_cache_stats(),
+        "template": processor.get_template_cache_stats(),
+    })
+
 def start_server(host, port):
     """Starts the Flask server natively."""
     logger.info(f"Initialising Server Handshake on {host}:{port}")
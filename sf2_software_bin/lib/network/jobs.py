@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from lib import json_processor
+from lib.network import envparse
+from lib.network.envparse import logger
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+STATUS_FILE = "status.json"
+CANCEL_FILE = "cancel"
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no free slot."""
+    pass
+
+class JobManager:
+    """
+    Runs SF2 generation jobs in the background.
+
+    Every job lives in its own directory under `root` (status.json, the
+    result file and a cancel marker), so status, download and cancel
+    requests can be answered by any server process, including other prefork
+    workers. Jobs are executed by the process that accepted them, on a
+    pool of `workers` threads with at most `max_queue` jobs waiting.
+
+    The time limit counts from submission (queue time included). It and
+    cancellation are checked before the first and after every report part,
+    the last one included; a part that is already rendering is allowed to
+    finish, so a job can overrun by up to one part before it is failed.
+    """
+
+    def __init__(self, root="jobs", workers=1, max_queue=16, timeout=600, ttl=3600):
+        self.root = root
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sf2-job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        os.makedirs(root, exist_ok=True)
+
+    # 1. Public API
+
+    def submit(self, parsed, archive_mode="stored"):
+        """
+        Queues a validated payload.ParsedPayload. Returns the job status dict.
+        Raises JobQueueFull if max_queue jobs are already waiting or running.
+        """
+        self.sweep()
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs pending)")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        total = sum(len(json_processor.split_parts(section, force_split=True)) for section in parsed.sections)
+        os.makedirs(self._job_dir(job_id))
+        status = self._write_status(job_id, {
+            "id": job_id,
+            "state": QUEUED,
+            "parts_total": total,
+            "parts_done": 0,
+            "archive_mode": archive_mode,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result_name": None,
+            "result_mimetype": None,
+        })
+
+        self._pool.submit(self._run, job_id, parsed, archive_mode)
+        logger.info(f"Queued job {job_id} ({total} part(s)).")
+        return status
+
+    def status(self, job_id):
+        """
+        Returns the status dict of a job, or None if it does not exist.
+        """
+        if not self._valid_id(job_id):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), STATUS_FILE), "r") as f:
+                status = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        status["cancel_requested"] = self._cancel_requested(job_id)
+        return status
+
+    def result_path(self, job_id):
+        """
+        Returns the path of a finished job's result file, or None.
+        """
+        status = self.status(job_id)
+        if not status or status["state"] != DONE:
+            return None
+        return os.path.join(self._job_dir(job_id), status["result_name"])
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or running job, or deletes a finished one.
+        Returns the resulting status dict (None if the job does not exist).
+        """
+        status = self.status(job_id)
+        if status is None:
+            return None
+
+        if status["state"] in FINISHED_STATES:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            status["state"] = "deleted"
+            logger.info(f"Deleted job {job_id}.")
+            return status
+
+        open(os.path.join(self._job_dir(job_id), CANCEL_FILE), "w").close()
+        status["cancel_requested"] = True
+        logger.info(f"Cancellation requested for job {job_id}.")
+        return status
+
+    def sweep(self):
+        """
+        Removes finished jobs older than ttl seconds.
+        """
+        now = time.time()
+        for job_id in os.listdir(self.root):
+            status = self.status(job_id)
+            if status and status["state"] in FINISHED_STATES and now - (status["finished_at"] or now) > self.ttl:
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    # 2. Worker
+
+    def _run(self, job_id, parsed, archive_mode):
+        try:
+            self._render(job_id, parsed, archive_mode)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _render(self, job_id, parsed, archive_mode):
+        if self._cancel_requested(job_id):
+            self._finish(job_id, CANCELLED)
+            return
+
+        status = self._update(job_id, state=RUNNING, started_at=time.time())
+        total = status["parts_total"]
+        # The time limit covers the time spent in the queue
+        deadline = status["submitted_at"] + self.timeout if self.timeout else None
+        self._check_deadline(deadline, 0, total)
+
+        job_dir = self._job_dir(job_id)
+        parts = json_processor.iter_rendered_parts(parsed, force_split=True)
+
+        # A lone report is kept as-is in single mode, like /gen-sf2.
+        if archive_mode == "single" and total == 1:
+            file_name, buf = next(parts)
+            if self._cancel_requested(job_id):
+                self._finish(job_id, CANCELLED)
+                return
+            self._check_deadline(deadline, 1, total)
+            with open(os.path.join(job_dir, file_name), "wb") as f:
+                f.write(buf.getbuffer())
+            self._finish(job_id, DONE, parts_done=1, result_name=file_name, result_mimetype=XLSX_MIMETYPE)
+            return
+
+        compression = zipfile.ZIP_DEFLATED if archive_mode == "deflated" else zipfile.ZIP_STORED
+        result_name = "Attendance_Reports.zip"
+        partial_path = os.path.join(job_dir, result_name + ".part")
+
+        cancelled = False
+        with zipfile.ZipFile(partial_path, "w", compression) as zf:
+            for done, (file_name, buf) in enumerate(parts, start=1):
+                zf.writestr(file_name, buf.getbuffer())
+                buf.close()
+                self._update(job_id, parts_done=done)
+
+                # Checked after every part, the last one included
+                if self._cancel_requested(job_id):
+                    cancelled = True
+                    break
+                self._check_deadline(deadline, done, total)
+
+        if cancelled:
+            self._finish(job_id, CANCELLED)
+            return
+
+        os.replace(partial_path, os.path.join(job_dir, result_name))
+        self._finish(job_id, DONE, result_name=result_name, result_mimetype="application/zip")
+
+    def _check_deadline(self, deadline, done, total):
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError(f"Job exceeded the {self.timeout}s time limit after {done}/{total} part(s)")
+
+    def _finish(self, job_id, state, **fields):
+        partial = [name for name in os.listdir(self._job_dir(job_id)) if name.endswith(".part")]
+        for name in partial:
+            os.remove(os.path.join(self._job_dir(job_id), name))
+        self._update(job_id, state=state, finished_at=time.time(), **fields)
+        logger.info(f"Job {job_id} {state}.")
+
+    # 3. Storage
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def _valid_id(self, job_id):
+        return len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)
+
+    def _cancel_requested(self, job_id):
+        return os.path.exists(os.path.join(self._job_dir(job_id), CANCEL_FILE))
+
+    def _update(self, job_id, **fields):
+        with open(os.path.join(self._job_dir(job_id), STATUS_FILE), "r") as f:
+            status = json.load(f)
+        status.update(fields)
+        return self._write_status(job_id, status)
+
+    def _write_status(self, job_id, status):
+        # Written to a temp file and renamed so readers never see half a file.
+        path = os.path.join(self._job_dir(job_id), STATUS_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(status, f)
+        os.replace(path + ".tmp", path)
+        return status
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_manager():
+    """
+    Returns this process's JobManager, created on first use so that prefork
+    workers each start their own threads after the fork.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            config = envparse.get_job_config()
+            _manager = JobManager(
+                root=config["JOBS_DIR"],
+                workers=int(config["JOB_WORKERS"]),
+                max_queue=int(config["JOB_QUEUE"]),
+                timeout=int(config["JOB_TIMEOUT"]),
+                ttl=int(config["JOB_TTL"]),
+            )
+        return _manager
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, select_address_family, get_sockaddr
+from lib.network.envparse import logger
+
+# Seconds to wait before replacing a worker that died, so a worker that
+# crashes on startup does not turn into a fork loop.
+RESPAWN_DELAY = 1.0
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    werkzeug server that handles requests on a fixed-size thread pool.
+    When every thread is busy the worker stops accepting, leaving new
+    connections on the shared socket for the other workers.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads=4, fd=None):
+        super().__init__(host, port, app, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="sf2-worker")
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self):
+        """
+        Lets in-flight requests finish, then closes the socket.
+        """
+        self._pool.shutdown(wait=True)
+        self.server_close()
+
+def resolve_workers(value):
+    """
+    WORKERS from .env: a positive number, or "auto" / 0 for one worker per CPU.
+    """
+    value = str(value).strip().lower()
+    if value in ("", "auto", "0"):
+        return os.cpu_count() or 1
+    workers = int(value)
+    if workers < 1:
+        raise ValueError(f"WORKERS must be at least 1 (got {value})")
+    return workers
+
+def preload(engine=None):
+    """
+    Imports the rendering stack and parses the template in the master so
+    forked workers share it copy-on-write.
+    """
+    from lib import processor, json_processor
+    from lib.network import handshake
+
+    template = json_processor._template_path()
+    try:
+        processor.preload_template(template, engine=engine)
+        logger.info(f"Preloaded SF2 template: {template}")
+    except FileNotFoundError as e:
+        logger.warning(f"Could not preload template ({e}). Workers will load it on demand.")
+    return handshake.app
+
+def create_socket(host, port, backlog):
+    """
+    Binds and listens once in the master; workers inherit the descriptor.
+    """
+    family = select_address_family(host, port)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(get_sockaddr(host, int(port), family))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _worker_main(app, sock, host, port, threads):
+    """
+    Runs inside a forked worker and never returns.
+    """
+    # The master handles Ctrl+C and tells workers to stop with SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    code = 0
+    server = None
+    try:
+        server = PooledWSGIServer(host, port, app, threads=threads, fd=sock.fileno())
+        logger.info(f"Worker {os.getpid()} ready ({threads} threads).")
+        server.serve_forever()
+    except SystemExit:
+        pass
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} crashed: {e}")
+        code = 1
+    finally:
+        if server is not None:
+            server.drain()
+    os._exit(code)
+
+def serve(host, port, workers, threads, backlog, engine=None):
+    """
+    Prefork server: the master preloads the app and template, binds the
+    listening socket, forks `workers` processes that accept on it and
+    replaces any worker that exits unexpectedly.
+    Falls back to the single-process server where fork is unavailable.
+    """
+    if not hasattr(os, "fork"):
+        from lib.network import handshake
+        logger.warning("os.fork is not available on this platform. Running a single server process.")
+        handshake.start_server(host, port)
+        return
+
+    # 1. Preload and bind in the master
+    app = preload(engine)
+    sock = create_socket(host, port, backlog)
+    logger.info(f"Prefork master {os.getpid()} listening on {host}:{port} "
+                f"({workers} workers x {threads} threads, backlog {backlog})")
+
+    children = {}
+    stopping = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(app, sock, host, port, threads)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    # 2. Fork workers
+    for slot in range(workers):
+        spawn(slot)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # 3. Supervise
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            slot = children.pop(pid, None)
+            if slot is None or stopping:
+                continue
+
+            logger.warning(f"Worker {pid} exited with status {status}. Restarting...")
+            time.sleep(RESPAWN_DELAY)
+            if not stopping:
+                spawn(slot)
+    finally:
+        sock.close()
+        logger.info("Prefork server stopped.")
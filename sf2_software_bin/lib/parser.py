@@ -1,10 +1,23 @@
 import json
 import os
+from collections.abc import Iterator
+
+# Records per chunk of a RecordSource (also the granularity of its offset index)
+CHUNK_SIZE = 1000
+# Parsed chunks kept in memory per source
+CACHED_CHUNKS = 4
+# Bytes sampled to estimate the record count before the file is indexed
+SAMPLE_BYTES = 64 * 1024
+
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
 
 def load_data(filepath):
     """
-    Parses the given file and returns a list of records.
-    Supported formats: .json, .csv (mocked)
+    Parses the given file and returns its records.
+    Supported formats:
+    - .json: the whole document (loaded at once)
+    - .csv (first row is the header), .jsonl / .ndjson (one object per
+      line): a lazy RecordSource that reads the records in chunks
     """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
@@ -19,71 +32,429 @@ def load_data(filepath):
             raise ValueError(f"Invalid JSON file: {e}")
             
     elif ext == '.csv':
-        # Mock CSV parsing for now
-        print(f"Mock parsing CSV file: {filepath}")
-        return [
-            {"name": "Student A", "status": "Present", "date": "2023-10-01"},
-            {"name": "Student B", "status": "Absent", "date": "2023-10-01"},
-            {"name": "Student C", "status": "Late", "date": "2023-10-01"}
-        ]
+        return RecordSource(filepath, RecordSource.FORMAT_CSV)
+    elif ext in JSON_LINES_EXTENSIONS:
+        return RecordSource(filepath, RecordSource.FORMAT_JSON_LINES)
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
+class RecordSource:
+    """
+    Read-only, list-like view of the records (dicts) of a CSV or JSON-lines
+    file that never holds the whole file in memory.
+
+    - Iteration streams the file once from the start.
+    - Indexing (source[i], source[a:b]) parses only the chunk of CHUNK_SIZE
+      records holding them, found through an index of chunk byte offsets
+      that is built as far as needed; the last CACHED_CHUNKS chunks are kept.
+    - len(source) is exact and indexes the whole file on first use (a fast
+      scan that parses nothing). estimated_length() answers right away from
+      a sample of the file until the count is known.
+    """
+    FORMAT_CSV = "csv"
+    FORMAT_JSON_LINES = "jsonl"
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.format = fmt
+        self.size = os.path.getsize(path)
+        self.fields = []
+        self._data_start = 0
+
+        if fmt == self.FORMAT_CSV:
+            self._read_header()
+        elif fmt != self.FORMAT_JSON_LINES:
+            raise ValueError(f"Unsupported record format: {fmt}")
+
+        self._offsets = []           # byte offset of every chunk's first record
+        self._scanned = 0            # records indexed so far
+        self._scan_pos = self._data_start
+        self._complete = False
+        self._chunks = {}            # chunk number -> list of records (insertion order = age)
+
+        if fmt == self.FORMAT_JSON_LINES:
+            first = self[0] if self._ensure_chunk(0) else None
+            self.fields = list(first.keys()) if isinstance(first, dict) else []
+
+    def _read_header(self):
+        import csv
+        with open(self.path, 'rb') as f:
+            head = f.readline()
+            bom = 3 if head.startswith(b'\xef\xbb\xbf') else 0
+            self._data_start = len(head)
+        text = head[bom:].decode('utf-8')
+        self.fields = next(csv.reader([text]), [])
+
+    # 1. Offset index
+
+    def _records(self, f):
+        """
+        Yields (offset, length) of each record from the current position of
+        binary file f. CSV records may span lines inside quotes; blank lines
+        are not records (csv.DictReader skips them too).
+        """
+        pos = f.tell()
+        start = None
+        in_quotes = False
+        for line in f:
+            if start is None:
+                if not line.strip():
+                    pos += len(line)
+                    continue
+                start = pos
+            pos += len(line)
+            if self.format == self.FORMAT_CSV and line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if not in_quotes:
+                yield start, pos - start
+                start = None
+        if start is not None:
+            yield start, pos - start
+
+    def _ensure_chunk(self, chunk):
+        """
+        Indexes the file until the start of `chunk` is known. Returns
+        False when the file has fewer chunks.
+        """
+        if chunk < len(self._offsets):
+            return True
+        if self._complete:
+            return False
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._scan_pos)
+            for offset, length in self._records(f):
+                if self._scanned % CHUNK_SIZE == 0:
+                    self._offsets.append(offset)
+                self._scanned += 1
+                self._scan_pos = offset + length
+                if chunk < len(self._offsets) and self._scanned % CHUNK_SIZE == 0:
+                    return True
+        self._complete = True
+        return chunk < len(self._offsets)
+
+    # 2. Length
+
+    @property
+    def length_known(self):
+        return self._complete
+
+    def __len__(self):
+        self._ensure_chunk(float("inf"))
+        return self._scanned
+
+    def estimated_length(self):
+        """
+        The record count if known, otherwise an estimate from the average
+        size of the records in the first SAMPLE_BYTES of the file.
+        """
+        if self._complete:
+            return self._scanned
+
+        records = 0
+        sampled = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._data_start)
+            for offset, length in self._records(f):
+                records += 1
+                sampled = offset + length - self._data_start
+                if sampled >= SAMPLE_BYTES:
+                    break
+        if not records:
+            return 0
+        remaining = self.size - self._data_start
+        return max(self._scanned, round(remaining / (sampled / records)))
+
+    def count_upto(self, n):
+        """
+        min(n, number of records), indexing no further than needed.
+        """
+        if n <= 0:
+            return 0
+        self._ensure_chunk((n - 1) // CHUNK_SIZE)
+        return min(n, self._scanned)
+
+    def __bool__(self):
+        return self._ensure_chunk(0)
+
+    # 3. Records
+
+    def _parse(self, f, limit=None):
+        """
+        Decodes records from binary file f at the current position.
+        """
+        import io
+        import itertools
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        if self.format == self.FORMAT_CSV:
+            import csv
+            records = csv.DictReader(text, fieldnames=self.fields, restval="")
+        else:
+            records = (self._parse_json_line(line) for line in text if line.strip())
+        return itertools.islice(records, limit)
+
+    def _parse_json_line(self, line):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON line in {os.path.basename(self.path)}: {e}")
+        return record if isinstance(record, dict) else {"value": record}
+
+    def chunk(self, number):
+        """
+        The records of one chunk (CHUNK_SIZE records, fewer for the last).
+        """
+        records = self._chunks.pop(number, None)
+        if records is None:
+            if not self._ensure_chunk(number):
+                raise IndexError(f"chunk {number} out of range")
+            with open(self.path, 'rb') as f:
+                f.seek(self._offsets[number])
+                records = list(self._parse(f, CHUNK_SIZE))
+            while len(self._chunks) >= CACHED_CHUNKS:
+                del self._chunks[next(iter(self._chunks))]
+        self._chunks[number] = records
+        return records
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start or 0, index.stop, index.step or 1
+            if start < 0 or stop is None or stop < 0 or step < 0:
+                return [self[i] for i in range(*index.indices(len(self)))]
+            # A window from the front: only the chunks it covers are indexed
+            return [self[i] for i in range(start, self.count_upto(stop), step)]
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("record index out of range")
+        chunk, offset = divmod(index, CHUNK_SIZE)
+        try:
+            records = self.chunk(chunk)
+        except IndexError:
+            raise IndexError("record index out of range")
+        if offset >= len(records):
+            raise IndexError("record index out of range")
+        return records[offset]
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self._data_start)
+            yield from self._parse(f)
+
+    def __repr__(self):
+        count = self._scanned if self._complete else f"~{self.estimated_length()}"
+        return f"RecordSource({self.path!r}, {self.format}, {count} records)"
+
+# Pipeline: source -> validate -> normalize -> sink
+#
+# Every stage is a generator over records, so a run makes one pass over the
+# source and holds a single record at a time:
+#
+#     report = parser.run_pipeline(parser.load_data("scans.csv"), sink="clean.json",
+#                                  normalize=True, on_progress=print)
+
+REQUIRED_KEYS = ["name", "status"]
+# Errors kept in a report (the rest are only counted)
+MAX_ERRORS = 100
+# Records between two progress callbacks
+PROGRESS_EVERY = 1000
+# Errors shown in a summary message
+SUMMARY_ERRORS = 5
+
+def new_report():
+    """
+    Counters filled in by the pipeline stages.
+    """
+    return {"read": 0, "written": 0, "error_count": 0, "errors": []}
+
+def _add_error(report, message, max_errors):
+    report["error_count"] += 1
+    if len(report["errors"]) < max_errors:
+        report["errors"].append(message)
+
+def track_records(records, report, on_progress=None, total=None, every=PROGRESS_EVERY):
+    """
+    Counts the records read and calls on_progress(read, total) every
+    `every` records and once at the end. total may be an estimate or None.
+    """
+    for record in records:
+        report["read"] += 1
+        if on_progress and report["read"] % every == 0:
+            on_progress(report["read"], total)
+        yield record
+    if on_progress:
+        on_progress(report["read"], report["read"])
+
+def validate_records(records, report, required_keys=REQUIRED_KEYS, max_errors=MAX_ERRORS):
+    """
+    Yields every record unchanged; records missing required keys are
+    reported (the first max_errors messages are kept).
+    """
+    for idx, record in enumerate(records):
+        if not isinstance(record, dict):
+            _add_error(report, f"Row {idx+1}: Not an object", max_errors)
+        else:
+            missing = [key for key in required_keys if key not in record]
+            if missing:
+                _add_error(report, f"Row {idx+1}: Missing {', '.join(missing)}", max_errors)
+        yield record
+
+def format_record(record):
+    """
+    Standardizes one record (title-case status and name). Returns the
+    record itself when nothing changes, otherwise a new dict.
+    """
+    changes = {}
+    for key in ("status", "name"):
+        value = record.get(key)
+        if isinstance(value, str) and value.title() != value:
+            changes[key] = value.title()
+    return {**record, **changes} if changes else record
+
+def normalize_records(records):
+    for record in records:
+        yield format_record(record) if isinstance(record, dict) else record
+
+def is_document(data):
+    """
+    True for loaded data that is not a sequence of records: a JSON object
+    or scalar document rather than a list, RecordSource or iterator.
+    """
+    return not isinstance(data, (list, tuple, RecordSource, Iterator))
+
+def write_records(records, filepath):
+    """
+    Writes records to .json, .csv or .jsonl / .ndjson one at a time. The
+    file is written under a temporary name and moved into place at the
+    end, so the source may be the file being replaced. Returns the number
+    of records written.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == '.json':
+        writer = _write_json
+    elif ext == '.csv':
+        writer = _write_csv
+    elif ext in JSON_LINES_EXTENSIONS:
+        writer = _write_json_lines
+    else:
+        raise ValueError(f"Unsupported save format: {ext}")
+    if writer is not _write_json and is_document(records):
+        raise ValueError(f"Only a list of records can be saved as {ext}")
+
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='' if ext == '.csv' else None) as f:
+            count = writer(records, f)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+def _write_json(records, f):
+    if is_document(records):
+        # A whole document (e.g. an SF2 payload), not a record list
+        json.dump(records, f, indent=4)
+        return 1
+
+    # Same layout as json.dump(records, f, indent=4)
+    count = 0
+    for record in records:
+        text = json.dumps(record, indent=4).replace("\n", "\n    ")
+        f.write(("[\n    " if count == 0 else ",\n    ") + text)
+        count += 1
+    f.write("\n]" if count else "[]")
+    return count
+
+def _write_json_lines(records, f):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+def _write_csv(records, f):
+    import csv
+    writer = None
+    count = 0
+    for record in records:
+        if writer is None:
+            # Columns come from the first record
+            writer = csv.DictWriter(f, fieldnames=list(record.keys()))
+            writer.writeheader()
+        writer.writerow(record)
+        count += 1
+    return count
+
+def run_pipeline(source, sink=None, validate=True, normalize=False, on_progress=None,
+                 max_errors=MAX_ERRORS, required_keys=REQUIRED_KEYS):
+    """
+    Runs source -> [validate] -> [normalize] -> [sink] in one pass.
+    source: any iterable of records (a list, a RecordSource, a generator).
+    sink: output path (see write_records); None only consumes the records.
+    on_progress(read, total): called every PROGRESS_EVERY records; total is
+    the (estimated) record count when the source can tell.
+    Returns the report (see new_report).
+    """
+    report = new_report()
+    if is_document(source):
+        # A whole JSON document (e.g. an SF2 payload) is saved as it is;
+        # iterating it would yield its keys, not records
+        if sink:
+            report["written"] = write_records(source, sink)
+        return report
+
+    if isinstance(source, RecordSource):
+        total = source.estimated_length()
+    else:
+        total = len(source) if hasattr(source, "__len__") else None
+
+    records = track_records(source, report, on_progress, total)
+    if validate:
+        records = validate_records(records, report, required_keys, max_errors)
+    if normalize:
+        records = normalize_records(records)
+
+    if sink:
+        report["written"] = write_records(records, sink)
+    else:
+        for _ in records:
+            pass
+    return report
+
+def error_summary(report, limit=SUMMARY_ERRORS):
+    """
+    The first `limit` errors of a report as one message.
+    """
+    errors = report["errors"][:limit]
+    more = report["error_count"] - len(errors)
+    return "\n".join(errors) + (f"\n... ({more} more)" if more else "")
+
 def validate_data(data):
     """
     Checks if data has required fields.
     Returns (bool, str): (IsValid, Message)
     """
-    if not isinstance(data, list):
+    if not isinstance(data, (list, RecordSource)):
         return False, "Data is not a list."
-        
-    required_keys = ["name", "status"]
-    errors = []
-    
-    for idx, record in enumerate(data):
-        missing = [key for key in required_keys if key not in record]
-        if missing:
-            errors.append(f"Row {idx+1}: Missing {', '.join(missing)}")
-            
-    if errors:
-        return False, "\n".join(errors[:5]) + ("\n..." if len(errors) > 5 else "")
+
+    report = run_pipeline(data, max_errors=SUMMARY_ERRORS)
+    if report["error_count"]:
+        return False, error_summary(report)
     
     return True, "Data is valid."
 
 def format_data(data):
     """
     Standardizes data formats (e.g., capitalize status).
-    Returns new list of data.
-    """
-    new_data = []
-    for record in data:
-        new_record = record.copy()
-        if "status" in new_record:
-            new_record["status"] = new_record["status"].title()
-        if "name" in new_record:
-            new_record["name"] = new_record["name"].title()
-        new_data.append(new_record)
-    return new_data
+    Returns new list of data. Use normalize_records / run_pipeline to
+    format large sources without building a list.
+    """
+    return list(normalize_records(data))
 
 def save_data(data, filepath):
     """
-    Saves data to JSON or CSV.
+    Saves data to JSON, CSV or JSON-lines, one record at a time.
     """
-    ext = os.path.splitext(filepath)[1].lower()
-    if ext == '.json':
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
-    elif ext == '.csv':
-        import csv
-        if not data:
-            with open(filepath, 'w') as f: 
-                pass # Empty file
-            return
-            
-        keys = data[0].keys()
-        with open(filepath, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(data)
-    else:
-        raise ValueError(f"Unsupported save format: {ext}")
+    write_records(data, filepath)
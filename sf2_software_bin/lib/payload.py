@@ -0,0 +1,309 @@
+import calendar
+import io
+import json
+import os
+import sys
+from . import school_calendar
+from .student import Student, STATUS_ABSENT
+
+REQUIRED_KEYS = ["school_info", "students"]
+INFO_KEYS = ["school_name", "school_id", "school_year", "month", "grade", "section"]
+# schema in plan used "name", "id", "year". mapping them:
+INFO_ALIASES = {"school_name": "name", "school_id": "id", "school_year": "year"}
+MAX_PER_GENDER = 30
+# Path that means "read the payload from standard input"
+STDIN_PATH = "-"
+
+class ParsedPayload:
+    """
+    A JSON payload parsed and validated once.
+
+    sections: normalized, processor-ready section dicts (header keys, dates,
+              holidays, sorted students_male / students_female as
+              student.Student records).
+    messages: ordered (level, text) results of every check, level being
+              "SUCCESS", "WARNING" or "ERROR".
+    counts:   one (label, male_count, female_count) per section.
+    """
+
+    def __init__(self, data, source=None):
+        self.data = data
+        self.source = source
+        self.sections = []
+        self.messages = []
+        self.counts = []
+
+    @property
+    def errors(self):
+        return [text for level, text in self.messages if level == "ERROR"]
+
+    @property
+    def warnings(self):
+        return [text for level, text in self.messages if level == "WARNING"]
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    @property
+    def is_bundle(self):
+        return is_bundle(self.data)
+
+    def exceeded(self):
+        """Sections over the per-gender template limit."""
+        return [c for c in self.counts if c[1] > MAX_PER_GENDER or c[2] > MAX_PER_GENDER]
+
+    def raise_for_errors(self):
+        if self.errors:
+            raise ValueError("; ".join(self.errors))
+
+    def _add(self, level, text):
+        self.messages.append((level, text))
+
+def read_json(file_path):
+    """
+    Reads a JSON file once ("-" reads standard input).
+    Raises FileNotFoundError or ValueError.
+    """
+    if file_path == STDIN_PATH:
+        try:
+            return json.load(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON format: {e}")
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"JSON file not found: {file_path}")
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON format: {e}")
+
+def load(file_path):
+    """
+    Reads, validates and normalizes a JSON file in one pass.
+    """
+    return parse(read_json(file_path), source=file_path)
+
+def is_bundle(data):
+    """
+    True if the payload holds many sections ("sections": [...]).
+    """
+    return isinstance(data, dict) and "sections" in data
+
+def iter_sections(data):
+    """
+    Yields one single-section payload per bundle section.
+    Bundle-level "school_info" supplies defaults (section keys win) and
+    bundle-level "holidays" apply to every section.
+    """
+    if not is_bundle(data):
+        yield data
+        return
+
+    shared_info = data.get("school_info", {})
+    shared_holidays = data.get("holidays", [])
+
+    for section in data.get("sections", []):
+        if not isinstance(section, dict):
+            yield {}
+            continue
+        merged = dict(section)
+        merged["school_info"] = {**shared_info, **section.get("school_info", {})}
+        merged["holidays"] = list(shared_holidays) + list(section.get("holidays", []))
+        yield merged
+
+def parse(data, source=None):
+    """
+    Validates and normalizes an already-decoded payload (single section or
+    bundle). Schema checks, limit counts and lint warnings are all collected
+    while walking the students once.
+    """
+    result = ParsedPayload(data, source)
+
+    if not isinstance(data, dict):
+        result._add("ERROR", "Root of the JSON document must be an object.")
+        return result
+
+    if is_bundle(data):
+        if not isinstance(data["sections"], list):
+            result._add("ERROR", "'sections' must be an array (list).")
+            return result
+        for idx, section in enumerate(iter_sections(data)):
+            _parse_section(section, result, f"Section {idx + 1}")
+    else:
+        _parse_section(data, result, None)
+
+    return result
+
+def _parse_section(data, result, label):
+    prefix = f"{label}: " if label else ""
+
+    # 1. Schema Check
+    missing = [key for key in REQUIRED_KEYS if key not in data]
+    for key in missing:
+        result._add("ERROR", f"{prefix}Missing required root key: '{key}'")
+    if missing:
+        return
+    result._add("SUCCESS", f"{prefix}Root schema required keys are present.")
+
+    school_info = data.get("school_info")
+    if not isinstance(school_info, dict):
+        result._add("ERROR", f"{prefix}'school_info' must be an object.")
+        return
+
+    students = data.get("students")
+    if not isinstance(students, list):
+        result._add("ERROR", f"{prefix}'students' must be an array (list).")
+        return
+
+    # 2. Header
+    section = {}
+    for key in INFO_KEYS:
+        if key in school_info:
+            section[key] = school_info[key]
+        elif INFO_ALIASES.get(key) in school_info:
+            section[key] = school_info[INFO_ALIASES[key]]
+        else:
+            section[key] = ""
+
+    section_ok = True
+    # "months" turns the section into a year-long payload, one report per month
+    yearly = "months" in school_info
+    try:
+        if yearly:
+            start_year, end_year = school_calendar.parse_school_year(section["school_year"])
+            year = school_calendar.get_school_year(start_year, end_year, school_info.get("allowed_days"))
+            months = _parse_months(school_info["months"])
+        else:
+            month = school_calendar.get_month(section["school_year"], section["month"], school_info.get("allowed_days"))
+            section["dates"] = list(month.dates)
+    except Exception as e:
+        result._add("ERROR", f"{prefix}Date Calculation Error: {e}")
+        section_ok = False
+
+    holidays = data.get("holidays", [])
+    if isinstance(holidays, list):
+        section["holidays"] = set(holidays)
+    else:
+        result._add("ERROR", f"{prefix}'holidays' must be an array (list).")
+        section_ok = False
+
+    # 3. Students (single pass: structure, gender counts, normalization)
+    students_male = []
+    students_female = []
+
+    for idx, s in enumerate(students):
+        if not isinstance(s, dict):
+            result._add("ERROR", f"{prefix}Student at index {idx} is not an object.")
+            section_ok = False
+            continue
+
+        if "name" not in s:
+            result._add("ERROR", f"{prefix}Student at index {idx} is missing a 'name'.")
+            section_ok = False
+
+        attendance = s.get("attendance", {})
+        if not isinstance(attendance, dict):
+            result._add("ERROR", f"{prefix}Student at index {idx} has an 'attendance' that is not an object.")
+            section_ok = False
+            continue
+
+        student_obj = (s.get("name", "Unknown"), attendance)
+
+        gender = str(s.get("gender", "M")).upper()
+        if gender in ("M", "MALE"):
+            students_male.append(student_obj)
+        else:
+            if gender not in ("F", "FEMALE"):
+                result._add("WARNING", f"{prefix}Unrecognized gender '{gender}' for student '{s.get('name', 'Unknown')}' (treated as female)")
+            students_female.append(student_obj)
+
+    if not section_ok:
+        return
+
+    if yearly:
+        _add_year_sections(section, year, months, students_male, students_female, result, label)
+        return
+
+    # 4. Compact records: attendance becomes a bitmask over the section's dates
+    dates = section["dates"]
+    date_index = month.index
+    students_male = [Student.from_attendance(name, "M", att, dates, date_index) for name, att in students_male]
+    students_female = [Student.from_attendance(name, "F", att, dates, date_index) for name, att in students_female]
+
+    # Sort
+    students_male.sort(key=lambda x: x.name)
+    students_female.sort(key=lambda x: x.name)
+    section["students_male"] = students_male
+    section["students_female"] = students_female
+
+    count_label = f"{label}: Grade {section['grade']} - {section['section']}" if label else ""
+    result.counts.append((count_label, len(students_male), len(students_female)))
+    result.sections.append(section)
+
+def _parse_months(spec):
+    """
+    school_info.months: "all" (None: every month that has data) or a list of
+    month names / numbers, returned in school-year order.
+    """
+    if spec == "all":
+        return None
+    if not isinstance(spec, list) or not spec:
+        raise ValueError("'months' must be \"all\" or a list of month names")
+    wanted = {school_calendar.parse_month(month) for month in spec}
+    return [num for num in school_calendar.SCHOOL_YEAR_MONTHS if num in wanted]
+
+def _add_year_sections(section, year, months, students_male, students_female, result, label):
+    """
+    Partitions a year-long section by month and adds one section per month.
+    The attendance is walked once; the roster is sorted once and every
+    month lists the students in that order, sharing the month's dates.
+    """
+    prefix = f"{label}: " if label else ""
+
+    # 1. Single pass: absences per student and month, months that have data
+    seen = set()
+    roster = []
+    for gender, students in (("M", students_male), ("F", students_female)):
+        for name, attendance in sorted(students, key=lambda x: x[0]):
+            masks = {}
+            for date_str, status in attendance.items():
+                column = year.column(date_str)
+                if column is None:
+                    continue
+                month_num, ordinal = column
+                seen.add(month_num)
+                if status == STATUS_ABSENT:
+                    masks[month_num] = masks.get(month_num, 0) | 1 << ordinal
+            roster.append((name, gender, masks))
+
+    holidays = {}
+    for date_str in section["holidays"]:
+        column = year.column(date_str)
+        if column is not None:
+            holidays.setdefault(column[0], set()).add(date_str)
+            seen.add(column[0])
+
+    if months is None:
+        months = [num for num in school_calendar.SCHOOL_YEAR_MONTHS if num in seen]
+        if not months:
+            result._add("ERROR", f"{prefix}No attendance or holiday dates fall within school year {section['school_year']}.")
+            return
+
+    # 2. One section per month
+    for month_num in months:
+        dates = list(year.months[month_num].dates)
+        month_section = dict(section, month=calendar.month_name[month_num], dates=dates,
+                             holidays=holidays.get(month_num, set()))
+        month_section["students_male"] = [Student(name, "M", masks.get(month_num, 0), dates)
+                                          for name, gender, masks in roster if gender == "M"]
+        month_section["students_female"] = [Student(name, "F", masks.get(month_num, 0), dates)
+                                            for name, gender, masks in roster if gender == "F"]
+        result.sections.append(month_section)
+
+    names = [calendar.month_name[num] for num in months]
+    result._add("SUCCESS", f"{prefix}Yearly payload: {len(months)} month(s) ({names[0]} - {names[-1]}).")
+    count_label = f"{label}: Grade {section['grade']} - {section['section']}" if label else ""
+    result.counts.append((count_label, len(students_male), len(students_female)))
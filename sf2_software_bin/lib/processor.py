@@ -1,8 +1,11 @@
-import openpyxl
-from openpyxl.styles import PatternFill
 import datetime
-import calendar
 import os
+import pickle
+import uuid
+from . import template_cache
+from . import attendance_matrix
+from . import school_calendar
+from .student import Student, STATUS_ABSENT
 
 # Cell Coordinates
 COORD_SCHOOL_ID = "G6"
@@ -35,76 +38,341 @@ COL_END_IDX = 31
 COL_ABSENT = 32 # AF
 COL_PRESENT = 33 # AG
 
-def get_weekdays_in_month(school_year_str, month_name):
+# Rendering Engines
+ENGINE_OPENPYXL = "openpyxl"
+ENGINE_XML = "xml"
+ENGINES = (ENGINE_OPENPYXL, ENGINE_XML)
+
+# Value Modes (what the statistic cells contain)
+#   formulas - formulas only; Excel/LibreOffice compute them on open
+#   cached   - formulas plus their precomputed result (xml engine only)
+#   values   - the precomputed numbers, no formulas
+VALUES_FORMULAS = "formulas"
+VALUES_CACHED = "cached"
+VALUES_PLAIN = "values"
+VALUE_MODES = (VALUES_FORMULAS, VALUES_CACHED, VALUES_PLAIN)
+
+class FormulaResult:
+    """A formula and its precomputed result, written by the "cached" mode."""
+    __slots__ = ("formula", "value")
+
+    def __init__(self, formula, value):
+        self.formula = formula
+        self.value = value
+
+def _load_workbook(path):
+    # openpyxl is imported on first use: validation, linting and the xml
+    # engine never need it, and it is the most expensive import in the app.
+    import openpyxl
+    return openpyxl.load_workbook(path)
+
+# Parsed template, kept as a pickle so every render unpickles its own workbook
+# instead of unzipping and re-parsing the .xlsx.
+_workbook_cache = template_cache.TemplateCache(
+    _load_workbook,
+    freeze=lambda wb: pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL),
+    thaw=pickle.loads,
+)
+
+def column_letter(idx):
+    """Converts a 1-based column index (32) to its name ("AF")."""
+    letters = ""
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def get_template_cache_stats():
+    """
+    Returns hit/miss/invalidation counts for the parsed template cache.
+    """
+    return _workbook_cache.stats()
+
+def get_weekdays_in_month(school_year_str, month_name, allowed_days=None):
     """
-    Returns a list of datetime objects for all weekdays (Mon-Fri) in the given month.
-    Handles School Year "2025-2026".
-    Logic:
+    Returns the dates ("YYYY-MM-DD") that get a column in the given month.
+    Handles School Year "2025-2026":
     - If Month is Jun-Dec: Use Start Year.
     - If Month is Jan-May: Use End Year.
     - If Jan: Start on first Monday >= Jan 4.
+    allowed_days: the section's class days (default Mon-Fri), see
+    school_calendar.parse_schedule.
+    The school year is computed once and cached by school_calendar; the
+    list returned is a fresh copy.
     """
-    month_map = {name: num for num, name in enumerate(calendar.month_name) if num}
-    month_num = month_map.get(month_name)
-    
-    if not month_num:
-        try:
-             month_num = int(month_name)
-        except:
-             raise ValueError(f"Invalid month name: {month_name}")
+    return list(school_calendar.get_month(school_year_str, month_name, allowed_days).dates)
 
-    try:
-        if "-" in str(school_year_str):
-            parts = str(school_year_str).split("-")
-            start_year = int(parts[0])
-            end_year = int(parts[1])
-        else:
-            start_year = int(school_year_str)
-            end_year = start_year + 1
-    except ValueError:
-         raise ValueError(f"Invalid School Year format: {school_year_str}")
+def new_run_id():
+    """
+    Identifier for one generation run, used to name its outputs without
+    checking which files already exist: <YYYYmmdd_HHMMSS>_<6 hex chars>.
+    """
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
 
-    if 1 <= month_num <= 5:
-        target_year = end_year
-    else:
-        target_year = start_year
-        
-    num_days = calendar.monthrange(target_year, month_num)[1]
-    weekdays = []
-    
-    for day in range(1, num_days + 1):
-        dt = datetime.date(target_year, month_num, day)
-        if dt.weekday() < 5: # 0=Mon, 4=Fri
-            # January Logic: Skip if before Jan 4
-            if month_num == 1 and day < 4:
-                continue
-            # If Jan 4 is reached, we must ensure we start on a Monday?
-            # User said "Start on first Monday >= Jan 4".
-            # If Jan 4 is Tue, we wait for next Mon? Or just start?
-            # User example: "Jan 1 Mon -> Jan 8 start". (Jan 8 is Mon). 
-            # "Jan 1 Thu -> Jan 5 start". (Jan 5 is Mon).
-            # So basically, find first Monday >= Jan 4.
-            if month_num == 1:
-                 # Check if we have found the start date yet
-                 if not weekdays:
-                     if dt.weekday() != 0: # Not Monday
-                         continue
-            
-            weekdays.append(dt.strftime("%Y-%m-%d"))
-            
-    return weekdays
+def resolve_engine(engine=None):
+    """
+    Picks the rendering engine: the explicit argument, then the SF2_ENGINE
+    environment variable, then openpyxl.
+    """
+    engine = (engine or os.environ.get("SF2_ENGINE") or ENGINE_OPENPYXL).strip().lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown SF2 engine: {engine} (expected one of: {', '.join(ENGINES)})")
+    return engine
 
-def save_to_excel(data, template_path, output_path):
+def resolve_value_mode(values=None, engine=None):
+    """
+    Picks the value mode: the explicit argument, then the SF2_VALUES
+    environment variable, then formulas. "cached" needs the xml engine,
+    because openpyxl cannot store a formula's result.
+    """
+    values = (values or os.environ.get("SF2_VALUES") or VALUES_FORMULAS).strip().lower()
+    if values not in VALUE_MODES:
+        raise ValueError(f"Unknown SF2 value mode: {values} (expected one of: {', '.join(VALUE_MODES)})")
+    if values == VALUES_CACHED and resolve_engine(engine) != ENGINE_XML:
+        raise ValueError("The 'cached' value mode requires the xml engine (--engine xml or SF2_ENGINE=xml)")
+    return values
+
+def save_to_excel(data, template_path, output_path, engine=None, values=None):
     """
     Saves data to SF2 Template with Formulas.
     data includes: 'holidays': set of date_strings
+    output_path: file path or a writable binary stream (e.g. io.BytesIO).
+    engine: "openpyxl" (default) or "xml", see resolve_engine.
+    values: "formulas" (default), "cached" or "values", see resolve_value_mode.
     """
     if not os.path.exists(template_path):
         raise FileNotFoundError(f"Template not found: {template_path}")
+
+    engine = resolve_engine(engine)
+    values = resolve_value_mode(values, engine)
+
+    if engine == ENGINE_XML:
+        from . import xml_engine
+        return xml_engine.save_to_excel(data, template_path, output_path, values=values)
         
-    wb = openpyxl.load_workbook(template_path)
-    sheet = wb.active 
-    
+    wb = _workbook_cache.get(template_path)
+    fill_sheet(wb.active, data, values=values)
+    wb.save(output_path)
+    return output_path
+
+def preload_template(template_path, engine=None):
+    """
+    Parses the template into the engine's cache ahead of the first render.
+    Used by servers that fork workers, so every worker inherits the parsed
+    template instead of loading it on its first request.
+    """
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template not found: {template_path}")
+
+    if resolve_engine(engine) == ENGINE_XML:
+        from . import xml_engine
+        xml_engine._skeleton_cache.get(template_path)
+    else:
+        _workbook_cache.get(template_path)
+
+def update_excel(workbook_path, delta, output_path=None, values=None):
+    """
+    Patches an SF2 generated earlier instead of rendering it again.
+
+    delta (all keys optional):
+        {"holidays": ["2025-03-14"],          # dates that become holidays
+         "school_days": ["2025-03-07"],       # holidays that become school days
+         "students": [{"name": "Cruz, Juan", "gender": "M",
+                       "attendance": {"2025-03-17": "ABSENT", "2025-03-18": "PRESENT"}}]}
+
+    The section is read back from the workbook (header, learner names, "x"
+    marks, holiday columns), the delta is applied and only the cells whose
+    content changes are rewritten; the rest of the file is copied as-is.
+    Learners are matched by name (and gender when given); adding or
+    removing learners needs a full render, since rows are sorted by name.
+
+    values: value mode to write, default the one the workbook already uses.
+    output_path: default is to replace workbook_path.
+    Returns {"path", "values", "changed_cells", "students", "holidays"}.
+    """
+    from . import xml_engine
+
+    if not os.path.exists(workbook_path):
+        raise FileNotFoundError(f"Workbook not found: {workbook_path}")
+    if not isinstance(delta, dict):
+        raise ValueError("Update delta must be a JSON object")
+
+    # 1. Read the current state back from the sheet
+    skeleton, current = xml_engine.read_workbook(workbook_path)
+    data, student_rows = _section_from_cells(current)
+    values = values or _detect_value_mode(current)
+    if values not in VALUE_MODES:
+        raise ValueError(f"Unknown SF2 value mode: {values} (expected one of: {', '.join(VALUE_MODES)})")
+
+    # 2. Apply the delta
+    summary = _apply_delta(data, student_rows, delta)
+
+    # 3. Re-fill and keep only the cells that differ
+    patch = xml_engine.SheetPatch()
+    fill_sheet(patch, data, values=values)
+    # fill_sheet leaves holiday columns alone; drop marks of days that became holidays
+    learner_rows = list(range(ROW_START_MALE, ROW_END_MALE + 1)) + list(range(ROW_START_FEMALE, ROW_END_FEMALE + 1))
+    for offset, date_str in enumerate(data["dates"]):
+        if date_str in data["holidays"]:
+            for row in learner_rows:
+                if current.get((row, COL_START_IDX + offset)) not in (None, ""):
+                    patch.cells[(row, COL_START_IDX + offset)] = ""
+    changed = {key: value for key, value in patch.cells.items() if not _same_cell(current.get(key), value)}
+
+    # 4. Write (atomically when replacing the input)
+    output_path = output_path or workbook_path
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        xml_engine.write_workbook(skeleton, changed, tmp_path, values=values)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    summary.update({"path": output_path, "values": values, "changed_cells": len(changed)})
+    return summary
+
+def _cell_key(coord):
+    letters = coord.rstrip("0123456789")
+    col = 0
+    for ch in letters:
+        col = col * 26 + (ord(ch) - 64)
+    return (int(coord[len(letters):]), col)
+
+def _section_from_cells(cells):
+    """
+    Rebuilds the section data fill_sheet was called with from a generated
+    sheet. Returns (data, {(name, gender): index into its students list}).
+    """
+    header = {}
+    for key, coord in (("school_name", COORD_SCHOOL_NAME), ("school_id", COORD_SCHOOL_ID),
+                       ("school_year", COORD_SCHOOL_YEAR), ("month", COORD_MONTH),
+                       ("grade", COORD_GRADE), ("section", COORD_SECTION)):
+        value = cells.get(_cell_key(coord))
+        header[key] = "" if value is None else value
+
+    # Date columns follow the school calendar; holidays have no day number
+    dates = get_weekdays_in_month(header["school_year"], header["month"])[:COL_END_IDX - COL_START_IDX + 1]
+    holidays = set()
+    for offset, date_str in enumerate(dates):
+        day = cells.get((ROW_HEADER_DATE, COL_START_IDX + offset))
+        if day in (None, ""):
+            holidays.add(date_str)
+        elif day != int(date_str[-2:]):
+            raise ValueError(f"Column {column_letter(COL_START_IDX + offset)} shows day {day} but the school "
+                             f"calendar gives {date_str}; this workbook cannot be updated in place")
+
+    data = dict(header, dates=dates, holidays=holidays)
+    student_rows = {}
+    for key, gender, start_row, end_row in (("students_male", "M", ROW_START_MALE, ROW_END_MALE),
+                                            ("students_female", "F", ROW_START_FEMALE, ROW_END_FEMALE)):
+        students = []
+        for row in range(start_row, end_row + 1):
+            name = cells.get((row, 2))
+            if name in (None, ""):
+                break
+            absent = 0
+            for offset in range(len(dates)):
+                if cells.get((row, COL_START_IDX + offset)) == "x":
+                    absent |= 1 << offset
+            student_rows[(str(name), gender)] = (key, len(students))
+            students.append(Student(name, gender, absent, dates))
+        if any(cells.get((r, 2)) not in (None, "") for r in range(start_row + len(students), end_row + 1)):
+            raise ValueError(f"Learner rows {start_row}-{end_row} have gaps; this workbook cannot be updated in place")
+        data[key] = students
+    return data, student_rows
+
+def _detect_value_mode(cells):
+    """
+    The value mode a generated sheet was written with, judged by its
+    statistic cells.
+    """
+    probes = [(ROW_START_MALE, COL_ABSENT), (ROW_START_FEMALE, COL_ABSENT)]
+    probes += [(ROW_DAILY_TOTAL_COMBINED, col) for col in range(COL_START_IDX, COL_END_IDX + 1)]
+    for key in probes:
+        value = cells.get(key)
+        if isinstance(value, FormulaResult):
+            if value.value not in (None, ""):
+                return VALUES_CACHED
+        elif isinstance(value, (int, float)):
+            return VALUES_PLAIN
+    return VALUES_FORMULAS
+
+def _apply_delta(data, student_rows, delta):
+    # The sheet's dates are the calendar's (possibly cut to the sheet's columns)
+    month = school_calendar.get_month(data["school_year"], data["month"])
+    num_dates = len(data["dates"])
+
+    def ordinal(date_str, what):
+        column = month.column(date_str)
+        if column is None or column >= num_dates:
+            raise ValueError(f"{what} {date_str} is not a school-calendar date of {data['month']} {data['school_year']}")
+        return column
+
+    # 1. Calendar
+    holidays_added = []
+    for date_str in delta.get("holidays", []):
+        ordinal(date_str, "Holiday")
+        if date_str not in data["holidays"]:
+            data["holidays"].add(date_str)
+            holidays_added.append(date_str)
+    for date_str in delta.get("school_days", []):
+        ordinal(date_str, "School day")
+        data["holidays"].discard(date_str)
+
+    # 2. Attendance
+    students_updated = 0
+    for entry in delta.get("students", []):
+        name = entry.get("name")
+        gender = str(entry.get("gender", "")).upper()[:1]
+        genders = (gender,) if gender else ("M", "F")
+        matches = [student_rows[(str(name), g)] for g in genders if (str(name), g) in student_rows]
+        if len(matches) != 1:
+            problem = "is not in this workbook" if not matches else "matches a male and a female learner; add \"gender\""
+            raise ValueError(f"Learner '{name}' {problem}")
+
+        key, index = matches[0]
+        student = data[key][index]
+        for date_str, status in entry.get("attendance", {}).items():
+            bit = 1 << ordinal(date_str, "Attendance date")
+            if status == STATUS_ABSENT:
+                student.absent |= bit
+            else:
+                student.absent &= ~bit
+        students_updated += 1
+
+    return {"students": students_updated, "holidays": holidays_added}
+
+def _same_cell(old, new):
+    """
+    Whether writing `new` (a fill_sheet value) would leave a cell read back
+    as `old` unchanged.
+    """
+    if old == "":
+        old = None
+    if new == "":
+        new = None
+
+    if isinstance(new, FormulaResult):
+        if not isinstance(old, FormulaResult) or old.formula != new.formula:
+            return False
+        return (old.value in (None, "") and new.value in (None, "")) or old.value == new.value
+    if isinstance(new, str) and new.startswith("=") and len(new) > 1:
+        return isinstance(old, FormulaResult) and old.formula == new and old.value in (None, "")
+    if isinstance(old, FormulaResult):
+        return False
+    return old == new
+
+def fill_sheet(sheet, data, values=VALUES_FORMULAS):
+    """
+    Writes the header, date columns, totals and student rows into an SF2 sheet.
+    Only uses `sheet[coord] = value` and `sheet.cell(row=, column=, value=)`,
+    so both rendering engines share it.
+    values: how the statistic cells are written, see VALUE_MODES. The
+    numbers come from the attendance matrix and match what the formulas
+    evaluate to.
+    """
     # 1. Fill Header Info
     sheet[COORD_SCHOOL_NAME] = data.get("school_name", "")
     sheet[COORD_SCHOOL_ID] = data.get("school_id", "")
@@ -117,6 +385,12 @@ def save_to_excel(data, template_path, output_path):
     dates = data.get("dates", [])
     holidays = data.get("holidays", set())
     
+    matrix = build_matrix(data)
+    daily_absent = matrix.daily_absences()
+    # The formulas count names with COUNTA, which skips empty names
+    named_male = _count_names(matrix.names_male)
+    named_female = _count_names(matrix.names_female)
+
     current_col = COL_START_IDX
     date_col_map = {}
     valid_days_count = 0
@@ -126,32 +400,41 @@ def save_to_excel(data, template_path, output_path):
             break 
             
         date_col_map[date_str] = current_col
-        col_letter = openpyxl.utils.get_column_letter(current_col)
+        col_letter = column_letter(current_col)
         
         # Write Day number to Row 10 ONLY if NOT holiday
         is_holiday = date_str in holidays
         if not is_holiday:
-            dt = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+            dt = datetime.date.fromisoformat(date_str)
             sheet.cell(row=ROW_HEADER_DATE, column=current_col, value=dt.day)
             valid_days_count += 1
         else:
             # Clear it just in case template has something
             sheet.cell(row=ROW_HEADER_DATE, column=current_col, value="")
 
+        # Daily totals as computed from the matrix ("" on holidays, like the formulas)
+        offset = current_col - COL_START_IDX
+        if is_holiday:
+            v_male = v_female = v_comb = ""
+        else:
+            v_male = named_male - daily_absent["male"][offset]
+            v_female = named_female - daily_absent["female"][offset]
+            v_comb = v_male + v_female
+
         # Inject Daily Total Formulas (Rows 43, 74, 75)
         # Male Total: Row 43
         # =IF(G10="","",COUNTA($B$13:$B$42)-(COUNTIF(G13:G42,"x") + COUNTIF(G13:G42,"h")*0.5))
         f_male = f'=IF({col_letter}10="","",COUNTA($B$13:$B$42)-(COUNTIF({col_letter}13:{col_letter}42,"x") + COUNTIF({col_letter}13:{col_letter}42,"h")*0.5))'
-        sheet.cell(row=ROW_DAILY_TOTAL_MALE, column=current_col, value=f_male)
+        sheet.cell(row=ROW_DAILY_TOTAL_MALE, column=current_col, value=_stat_value(f_male, v_male, values))
         
         # Female Total: Row 74
         f_female = f'=IF({col_letter}10="","",COUNTA($B$44:$B$73)-(COUNTIF({col_letter}44:{col_letter}73,"x") + COUNTIF({col_letter}44:{col_letter}73,"h")*0.5))'
-        sheet.cell(row=ROW_DAILY_TOTAL_FEMALE, column=current_col, value=f_female)
+        sheet.cell(row=ROW_DAILY_TOTAL_FEMALE, column=current_col, value=_stat_value(f_female, v_female, values))
         
         # Combined: Row 75
         # =IF(G10="","",G43+G74)
         f_comb = f'=IF({col_letter}10="","",{col_letter}43+{col_letter}74)'
-        sheet.cell(row=ROW_DAILY_TOTAL_COMBINED, column=current_col, value=f_comb)
+        sheet.cell(row=ROW_DAILY_TOTAL_COMBINED, column=current_col, value=_stat_value(f_comb, v_comb, values))
 
         current_col += 1
 
@@ -159,46 +442,66 @@ def save_to_excel(data, template_path, output_path):
     sheet[COORD_TOTAL_DAYS] = valid_days_count
         
     # 3. Fill Students & Formulas
-    _fill_student_section(sheet, data.get("students_male", []), ROW_START_MALE, ROW_END_MALE, date_col_map, holidays)
-    _fill_student_section(sheet, data.get("students_female", []), ROW_START_FEMALE, ROW_END_FEMALE, date_col_map, holidays)
-    
-    wb.save(output_path)
-    return output_path
+    absences = matrix.absences()
+    _fill_student_section(sheet, matrix.names_male, matrix.rows("male"), absences[:matrix.n_male],
+                          ROW_START_MALE, matrix.school_days, values)
+    _fill_student_section(sheet, matrix.names_female, matrix.rows("female"), absences[matrix.n_male:],
+                          ROW_START_FEMALE, matrix.school_days, values)
 
-def _fill_student_section(sheet, students, start_row, end_row, date_col_map, holidays):
-    current_row = start_row
-    
-    for student in students:
-        if current_row > end_row:
-            break
+def build_matrix(data):
+    """
+    Attendance matrix of a section, limited to the students and date
+    columns that fit the template.
+    """
+    return attendance_matrix.build(
+        data,
+        max_days=COL_END_IDX - COL_START_IDX + 1,
+        max_students=ROW_END_MALE - ROW_START_MALE + 1,
+    )
+
+def _count_names(names):
+    return sum(1 for name in names if name is not None and name != "")
+
+def _stat_value(formula, value, values):
+    """
+    The content of a statistic cell for the given value mode.
+    """
+    if values == VALUES_FORMULAS:
+        return formula
+    if values == VALUES_CACHED:
+        return FormulaResult(formula, value)
+    return value
+
+def _fill_student_section(sheet, names, code_rows, absences, start_row, school_days, values):
+    school_day_count = sum(school_days)
+
+    for offset, (name, codes) in enumerate(zip(names, code_rows)):
+        current_row = start_row + offset
+        blank = name is None or name == ""
             
         # Name at Column B (2)
-        sheet.cell(row=current_row, column=2, value=student.get("name", ""))
-        
-        # Attendance
-        attendance_records = student.get("attendance", {})
+        sheet.cell(row=current_row, column=2, value=name)
         
-        for date_str, col_idx in date_col_map.items():
-            if date_str in holidays:
-                continue # Skip writing to holiday columns
-                
-            status = attendance_records.get(date_str, "PRESENT")
-            val = "x" if status == "ABSENT" else ""
-            sheet.cell(row=current_row, column=col_idx, value=val)
+        # Attendance (holiday columns are left untouched)
+        for col_offset, code in enumerate(codes):
+            if not school_days[col_offset]:
+                continue
+            val = "x" if code == attendance_matrix.STATUS_ABSENT else ""
+            sheet.cell(row=current_row, column=COL_START_IDX + col_offset, value=val)
             
         # Inject Student Stats Formulas
         # Absences (AF / Col 32)
         # =IF(B13="","",COUNTIF(G13:AE13,"x") + COUNTIF(G13:AE13,"h")*0.5)
-        col_af = openpyxl.utils.get_column_letter(COL_ABSENT)
-        col_ag = openpyxl.utils.get_column_letter(COL_PRESENT)
+        col_af = column_letter(COL_ABSENT)
+        col_ag = column_letter(COL_PRESENT)
         
         range_str = f"G{current_row}:AE{current_row}"
         f_abs = f'=IF(B{current_row}="","",COUNTIF({range_str},"x") + COUNTIF({range_str},"h")*0.5)'
-        sheet.cell(row=current_row, column=COL_ABSENT, value=f_abs)
+        v_abs = "" if blank else absences[offset]
+        sheet.cell(row=current_row, column=COL_ABSENT, value=_stat_value(f_abs, v_abs, values))
         
         # Presence (AG / Col 33)
         # =IF(B13="","",$AQ$9-AF13)
         f_pres = f'=IF(B{current_row}="","",$AQ$9-{col_af}{current_row})'
-        sheet.cell(row=current_row, column=COL_PRESENT, value=f_pres)
-
-        current_row += 1
+        v_pres = "" if blank else school_day_count - absences[offset]
+        sheet.cell(row=current_row, column=COL_PRESENT, value=_stat_value(f_pres, v_pres, values))
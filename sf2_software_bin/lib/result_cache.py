@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from . import template_cache
+from .student import Student
+
+# Bump when a change to the renderers alters their output for the same input,
+# so reports cached by an older version are not served again.
+RENDER_VERSION = 1
+
+DEFAULT_MEMORY_MB = 64
+DEFAULT_DISK_MB = 512
+
+def _canonical(obj):
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, Student):
+        return obj.canonical()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def canonical_bytes(obj):
+    """
+    Stable JSON encoding of a normalized payload: sorted keys, no whitespace,
+    sets as sorted lists, Student records as their name and absent dates.
+    Equal payloads always give equal bytes.
+    """
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                      default=_canonical).encode("utf-8")
+
+def part_key(part_data, template_path, engine, **options):
+    """
+    Content address of one rendered report: the normalized part data, the
+    template's content hash, the engine and any rendering options.
+    """
+    sha = hashlib.sha256()
+    sha.update(canonical_bytes({
+        "render_version": RENDER_VERSION,
+        "template": template_cache.cached_digest(template_path),
+        "engine": engine,
+        "options": options,
+    }))
+    sha.update(b"\0")
+    sha.update(canonical_bytes(part_data))
+    return sha.hexdigest()
+
+def combined_key(keys, *extra):
+    """
+    One key for a response made of several parts (used as the HTTP ETag).
+    """
+    sha = hashlib.sha256()
+    for item in list(keys) + [str(e) for e in extra]:
+        sha.update(item.encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+class ResultCache:
+    """
+    Two-tier cache of rendered .xlsx bytes keyed by part_key.
+
+    Memory tier: LRU bounded by max_memory_bytes (0 disables it).
+    Disk tier:   one file per key under disk_dir, bounded by max_disk_bytes;
+                 least recently used files (by mtime, refreshed on hit) are
+                 evicted. The directory can be shared by several processes.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MEMORY_MB * 1024 * 1024, disk_dir=None,
+                 max_disk_bytes=DEFAULT_DISK_MB * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_memory_bytes > 0 or bool(self.disk_dir)
+
+    def get(self, key):
+        """
+        Returns the cached bytes for key, or None.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return data
+
+        data = self._disk_get(key)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def stats(self):
+        with self._lock:
+            if self._disk_bytes is None and self.disk_dir:
+                self._disk_bytes = self._scan_disk()[1]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes or 0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    # 1. Memory tier (caller holds the lock)
+
+    def _memory_put(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.memory_evictions += 1
+
+    # 2. Disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.xlsx")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data):
+        if not self.disk_dir or len(data) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written to a temp file and renamed so readers never see half a file.
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".xlsx"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return files, total
+
+    def _evict_disk(self):
+        # Rescan: other processes may share the directory.
+        files, total = self._scan_disk()
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        self._disk_bytes = total
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_cache():
+    """
+    Returns the process-wide ResultCache, configured from the environment:
+    SF2_CACHE_MEMORY_MB (memory tier size, 0 disables it), SF2_CACHE_DIR
+    (disk tier directory, unset disables it) and SF2_CACHE_DISK_MB.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            memory_mb = float(os.environ.get("SF2_CACHE_MEMORY_MB", DEFAULT_MEMORY_MB))
+            disk_mb = float(os.environ.get("SF2_CACHE_DISK_MB", DEFAULT_DISK_MB))
+            _default_cache = ResultCache(
+                max_memory_bytes=int(memory_mb * 1024 * 1024),
+                disk_dir=os.environ.get("SF2_CACHE_DIR") or None,
+                max_disk_bytes=int(disk_mb * 1024 * 1024),
+            )
+        return _default_cache
+
+def get_cache_stats():
+    """
+    Returns hit/miss/eviction counters for the process-wide result cache.
+    """
+    return get_cache().stats()
@@ -0,0 +1,200 @@
+"""
+School calendar: which dates get a column in a month's SF2.
+
+A school year "2025-2026" runs June 2025 - May 2026. Classes are held on the
+section's schedule (Mon-Fri unless the payload gives `allowed_days`), and
+January starts on the first Monday on or after January 4, when classes
+resume after the break.
+
+The whole school year is computed in one pass the first time any of its
+months is asked for, then cached per (school year, schedule):
+
+    month = school_calendar.get_month("2025-2026", "January")
+    month.dates                      # ("2026-01-05", "2026-01-06", ...)
+    month.column("2026-01-07")       # 2 (ordinal of the date column, O(1))
+    month.school_days({"2026-01-07"})  # [True, True, False, ...]
+
+    year = school_calendar.get_school_year(2025)
+    year.column("2026-01-07")        # (1, 2): January, column 2
+
+Holidays do not remove columns (the SF2 keeps them blank), so they are
+passed to the lookups rather than being part of the cached calendar.
+"""
+import datetime
+import calendar
+
+WEEKDAYS = (0, 1, 2, 3, 4)  # Mon-Fri
+
+# Labels used in the composer headers, indexed by date.weekday()
+DAY_LABELS = ["(M)", "(T)", "(W)", "(TH)", "(F)", "(S)", "(SU)"]
+
+# Accepted spellings of allowed_days entries
+DAY_NAMES = {}
+for _num, _name in enumerate(calendar.day_name):
+    DAY_NAMES[_name.upper()] = _num
+    DAY_NAMES[_name[:3].upper()] = _num
+    DAY_NAMES[DAY_LABELS[_num].strip("()")] = _num
+
+MONTH_NUMBERS = {name: num for num, name in enumerate(calendar.month_name) if num}
+
+# First month of the school year; months before it belong to the end year
+SCHOOL_YEAR_START_MONTH = 6
+
+# Months in school-year order (June - May)
+SCHOOL_YEAR_MONTHS = tuple(range(SCHOOL_YEAR_START_MONTH, 13)) + tuple(range(1, SCHOOL_YEAR_START_MONTH))
+
+# Resumption rule: January starts on the first Monday on or after this day
+JANUARY_RESUME_DAY = 4
+
+_years = {}  # (start_year, end_year, schedule) -> SchoolYear
+
+def parse_school_year(school_year_str):
+    """
+    "2025-2026" -> (2025, 2026); a single year "2025" means 2025-2026.
+    """
+    try:
+        if "-" in str(school_year_str):
+            parts = str(school_year_str).split("-")
+            return int(parts[0]), int(parts[1])
+        start_year = int(school_year_str)
+        return start_year, start_year + 1
+    except ValueError:
+        raise ValueError(f"Invalid School Year format: {school_year_str}")
+
+def parse_month(month_name):
+    """
+    "January" or 1 / "1" -> 1.
+    """
+    month_num = MONTH_NUMBERS.get(month_name)
+    if not month_num:
+        try:
+            month_num = int(month_name)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid month name: {month_name}")
+    if not 1 <= month_num <= 12:
+        raise ValueError(f"Invalid month name: {month_name}")
+    return month_num
+
+def parse_schedule(allowed_days=None):
+    """
+    Normalizes a section's allowed_days (names such as "Monday", "Mon",
+    "M", "TH", or weekday numbers 0=Mon..6=Sun) to a sorted tuple of weekday
+    numbers. None or an empty list means Mon-Fri.
+    """
+    if not allowed_days:
+        return WEEKDAYS
+    if isinstance(allowed_days, str):
+        allowed_days = [allowed_days]
+
+    days = set()
+    for day in allowed_days:
+        if isinstance(day, int) and 0 <= day <= 6:
+            days.add(day)
+        elif isinstance(day, str) and day.strip().upper() in DAY_NAMES:
+            days.add(DAY_NAMES[day.strip().upper()])
+        else:
+            raise ValueError(f"Invalid allowed day: {day!r} (use e.g. \"Monday\", \"Mon\", \"TH\" or 0-6)")
+    return tuple(sorted(days))
+
+def get_month(school_year_str, month_name, allowed_days=None):
+    """
+    The MonthCalendar of a month in a school year. Cached; do not modify
+    the returned object.
+    """
+    start_year, end_year = parse_school_year(school_year_str)
+    month_num = parse_month(month_name)
+    return get_school_year(start_year, end_year, allowed_days).months[month_num]
+
+def get_school_year(start_year, end_year=None, allowed_days=None):
+    """
+    The SchoolYear starting in June of start_year, computed once per
+    (years, schedule).
+    """
+    end_year = start_year + 1 if end_year is None else end_year
+    key = (start_year, end_year, parse_schedule(allowed_days))
+    school_year = _years.get(key)
+    if school_year is None:
+        school_year = _years[key] = SchoolYear(*key)
+    return school_year
+
+def clear_cache():
+    _years.clear()
+
+def day_label(date_str):
+    """
+    Composer column header parts for a date: ("05", "(M)").
+    """
+    dt = datetime.date.fromisoformat(date_str)
+    return f"{dt.day:02d}", DAY_LABELS[dt.weekday()]
+
+class SchoolYear:
+    """
+    Class days of every month of a school year on one schedule.
+    """
+
+    def __init__(self, start_year, end_year, schedule=WEEKDAYS):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.schedule = schedule
+
+        by_month = {num: [] for num in range(1, 13)}
+        allowed = [weekday in schedule for weekday in range(7)]
+        for month_num in range(1, 13):
+            year = end_year if month_num < SCHOOL_YEAR_START_MONTH else start_year
+            first_weekday, num_days = calendar.monthrange(year, month_num)
+            first_day = 1
+            if month_num == 1:
+                # First Monday on or after the resumption day
+                resume_weekday = (first_weekday + JANUARY_RESUME_DAY - 1) % 7
+                first_day = JANUARY_RESUME_DAY + (7 - resume_weekday) % 7
+            for day in range(first_day, num_days + 1):
+                if allowed[(first_weekday + day - 1) % 7]:
+                    by_month[month_num].append(f"{year:04d}-{month_num:02d}-{day:02d}")
+
+        self.months = {num: MonthCalendar(dates) for num, dates in by_month.items()}
+        # date -> (month, column) over the whole year
+        self.index = {date_str: (num, i) for num, month in self.months.items()
+                      for date_str, i in month.index.items()}
+
+    def column(self, date_str):
+        """
+        (month number, column ordinal) of a date, None when it has no column.
+        """
+        return self.index.get(date_str)
+
+class MonthCalendar:
+    """
+    The date columns of one month, with O(1) date -> column lookups.
+    """
+    __slots__ = ("dates", "index")
+
+    def __init__(self, dates):
+        self.dates = tuple(dates)
+        self.index = {date_str: i for i, date_str in enumerate(self.dates)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, date_str):
+        return date_str in self.index
+
+    def column(self, date_str):
+        """
+        Ordinal of the date's column, None when the date has none.
+        """
+        return self.index.get(date_str)
+
+    def school_days(self, holidays=()):
+        """
+        One bool per column: False for the given holidays.
+        """
+        return [date_str not in holidays for date_str in self.dates]
+
+    def count_school_days(self, holidays=()):
+        return len(self.dates) - sum(1 for date_str in holidays if date_str in self.index)
+
+    def labels(self):
+        """
+        Composer column headers: [("05", "(M)"), ...].
+        """
+        return [day_label(date_str) for date_str in self.dates]
@@ -0,0 +1,101 @@
+"""
+Compact learner record used from ingestion (payload, csv_processor) to
+rendering.
+
+A section's students used to be dicts holding a {date: "PRESENT"/"ABSENT"}
+dict each, repeating every date string per learner. A Student keeps its
+absences as one int bitmask over the section's date columns instead: bit i
+is set when the learner was absent on dates[i]. The dates include the
+holidays (they keep a blank column), so ordinals are column positions, not
+school-day counts; attendance_matrix masks the holidays out. The dates
+list itself is shared by every student of the section.
+
+For code written against the dict form, student["name"] and
+student.get("attendance", {}) still work (read-only).
+"""
+STATUS_ABSENT = "ABSENT"
+STATUS_PRESENT = "PRESENT"
+
+class Student:
+    __slots__ = ("name", "gender", "absent", "dates")
+
+    def __init__(self, name, gender="M", absent=0, dates=()):
+        self.name = name
+        self.gender = gender
+        self.absent = absent   # bitmask over dates (holidays included)
+        self.dates = dates     # the section's dates, shared, not copied
+
+    @classmethod
+    def from_attendance(cls, name, gender, attendance, dates, date_index=None):
+        """
+        Builds a Student from a {date: status} dict. Only ABSENT marks on
+        one of `dates` are kept; anything else counts as present, as it does
+        in the rendered sheet. Pass date_index ({date: ordinal}) when
+        converting many students of the same section.
+        """
+        if date_index is None:
+            date_index = index_dates(dates)
+        absent = 0
+        for date_str, status in attendance.items():
+            if status == STATUS_ABSENT:
+                ordinal = date_index.get(date_str)
+                if ordinal is not None:
+                    absent |= 1 << ordinal
+        return cls(name, gender, absent, dates)
+
+    def is_absent(self, ordinal):
+        return bool(self.absent >> ordinal & 1)
+
+    def absent_ordinals(self):
+        """
+        Yields the ordinals of the absent days in ascending order.
+        """
+        mask = self.absent
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def absent_dates(self):
+        return [self.dates[i] for i in self.absent_ordinals()]
+
+    @property
+    def attendance(self):
+        """
+        {date: "ABSENT"} for the absent days (the dict form's equivalent).
+        """
+        return {date_str: STATUS_ABSENT for date_str in self.absent_dates()}
+
+    def to_dict(self):
+        """
+        The dict form used in JSON payloads.
+        """
+        return {"name": self.name, "gender": self.gender, "attendance": self.attendance}
+
+    def canonical(self):
+        """
+        Stable, JSON-serializable form for content hashing (result_cache).
+        """
+        return {"name": self.name, "absent": self.absent_dates()}
+
+    # Read-only dict compatibility
+
+    def __getitem__(self, key):
+        if key in ("name", "gender", "attendance"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Student({self.name!r}, {self.gender!r}, absent={len(self.absent_dates())} day(s))"
+
+def index_dates(dates):
+    """
+    {date: ordinal} lookup for a section's dates.
+    """
+    return {date_str: i for i, date_str in enumerate(dates)}
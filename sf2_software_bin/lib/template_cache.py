@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+
+def file_digest(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+def cached_digest(path):
+    """
+    file_digest, re-hashed only when the file's mtime or size changes.
+    Used to tag cached output with the template version it was built from.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _digests_lock:
+        entry = _digests.get(path)
+        if entry and entry[0] == stamp:
+            return entry[1]
+
+    digest = file_digest(path)
+    with _digests_lock:
+        _digests[path] = (stamp, digest)
+    return digest
+
+class TemplateCache:
+    """
+    Parses a template file once per process and hands out independent copies.
+
+    loader(path) parses the file, freeze(obj) turns the parsed object into the
+    form kept in the cache and thaw(frozen) builds a fresh copy for each caller.
+    An entry is reused while the file's mtime and size are unchanged. If they
+    change, the contents are re-hashed and the entry is only dropped when the
+    hash differs too (a plain `touch` does not force a re-parse).
+    """
+
+    def __init__(self, loader, freeze=None, thaw=None):
+        self._loader = loader
+        self._freeze = freeze or (lambda obj: obj)
+        self._thaw = thaw or (lambda obj: obj)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                self.hits += 1
+            elif entry and entry["size"] == st.st_size and entry["digest"] == file_digest(path):
+                # Touched but not modified
+                entry["mtime"] = st.st_mtime_ns
+                self.hits += 1
+            else:
+                if entry:
+                    self.invalidations += 1
+                self.misses += 1
+                entry = {
+                    "mtime": st.st_mtime_ns,
+                    "size": st.st_size,
+                    "digest": file_digest(path),
+                    "value": self._freeze(self._loader(path)),
+                }
+                self._entries[path] = entry
+
+            frozen = entry["value"]
+
+        return self._thaw(frozen)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -45,6 +45,9 @@ class SaveScreen(Screen):
         elif event.button.id == "btn_cancel_save":
             self.app.pop_screen()
 
+# Records shown per page of the data table
+PAGE_SIZE = 100
+
 class DataScreen(Screen):
     """Screen to view and manipulate data."""
     
@@ -52,10 +55,15 @@ class DataScreen(Screen):
         ("v", "validate", "Validate"),
         ("f", "format", "Format"),
         ("s", "save", "Save"),
+        ("n", "next_page", "Next Page"),
+        ("p", "prev_page", "Prev Page"),
         ("b", "back", "Back"),
         ("q", "quit", "Quit"),
     ]
 
+    page = 0
+    headers = []
+
     def compose(self) -> ComposeResult:
         yield Header()
         yield Container(
@@ -79,16 +87,52 @@ class DataScreen(Screen):
         table.clear(columns=True)
         table.cursor_type = "row"
         table.zebra_stripes = True
+        self.page = 0
         
-        if not data:
+        if not isinstance(data, (list, parser.RecordSource)) or not data:
             return
 
-        headers = list(data[0].keys())
-        table.add_columns(*headers)
+        if isinstance(data, parser.RecordSource) and data.fields:
+            self.headers = list(data.fields)
+        else:
+            self.headers = list(data[0].keys())
+        table.add_columns(*self.headers)
+        self.show_page(0)
+
+    def show_page(self, page):
+        """
+        Fills the table with one page of records; only that window is read
+        from the data.
+        """
+        data = self.app.current_data
+        start = page * PAGE_SIZE
+        records = data[start:start + PAGE_SIZE]
+        if not records and page > 0:
+            return
 
-        for item in data:
-            row = [str(item.get(h, "")) for h in headers]
+        self.page = page
+        table = self.query_one(DataTable)
+        table.clear()
+        for item in records:
+            if self.app.normalize:
+                item = parser.format_record(item)
+            row = [str(item.get(h, "")) for h in self.headers]
             table.add_row(*row)
+
+        if isinstance(data, parser.RecordSource) and not data.length_known:
+            total = f"~{data.estimated_length():,}"
+        else:
+            total = f"{len(data):,}"
+        self.query_one("#status-bar").update(
+            f"Rows {start + 1:,}-{start + len(records):,} of {total} (page {page + 1}; n/p to change page)")
+
+    def action_next_page(self):
+        if self.headers:
+            self.show_page(self.page + 1)
+
+    def action_prev_page(self):
+        if self.headers and self.page > 0:
+            self.show_page(self.page - 1)
             
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "btn_validate":
@@ -101,17 +145,32 @@ class DataScreen(Screen):
             self.action_back()
 
     def action_validate(self):
-        is_valid, msg = parser.validate_data(self.app.current_data)
-        if is_valid:
+        data = self.app.current_data
+        if not isinstance(data, (list, parser.RecordSource)):
+            self.notify("Validation Failed", severity="error")
+            self.query_one("#status-bar").update("Errors: Data is not a list.")
+            return
+        # One streaming pass in a worker thread; the status bar shows progress
+        self.run_worker(lambda: self._validate_worker(data), thread=True, exclusive=True)
+
+    def _validate_worker(self, data):
+        report = parser.run_pipeline(data, on_progress=self.app.progress_callback("Validating"))
+        self.app.call_from_thread(self._validate_done, report)
+
+    def _validate_done(self, report):
+        if not report["error_count"]:
+            msg = f"Data is valid. ({report['read']} records)"
             self.notify(msg, severity="information")
             self.query_one("#status-bar").update(f"Status: {msg}")
         else:
-            self.notify("Validation Failed", severity="error")
-            self.query_one("#status-bar").update(f"Errors: {msg}")
+            self.notify(f"Validation Failed ({report['error_count']} errors)", severity="error")
+            self.query_one("#status-bar").update(f"Errors: {parser.error_summary(report)}")
 
     def action_format(self):
-        self.app.current_data = parser.format_data(self.app.current_data)
-        self.update_table(self.app.current_data)
+        # Formatting is applied as records are shown and saved, not to a copy
+        self.app.normalize = True
+        if self.headers:
+            self.show_page(self.page)
         self.notify("Data formatted", severity="information")
 
     def action_save(self):
@@ -223,7 +282,10 @@ class AttendanceApp(App):
     def __init__(self, initial_file=None):
         super().__init__()
         self.initial_file = initial_file
+        self.current_file = None
         self.current_data = []
+        # Format was requested: records are normalized when shown and saved
+        self.normalize = False
 
     def on_mount(self) -> None:
         if self.initial_file:
@@ -234,18 +296,49 @@ class AttendanceApp(App):
     def load_file(self, filepath):
         try:
             self.current_data = parser.load_data(filepath)
+            self.current_file = filepath
+            self.normalize = False
             self.push_screen("data")
             self.notify(f"Loaded {os.path.basename(filepath)}")
         except Exception as e:
             self.notify(f"Error loading file: {e}", severity="error")
 
+    def progress_callback(self, action):
+        """
+        on_progress for parser.run_pipeline running in a worker thread:
+        shows "<action>: read / total" in the status bar.
+        """
+        def on_progress(read, total):
+            text = f"{action}: {read:,} / ~{total:,} records" if total else f"{action}: {read:,} records"
+            self.call_from_thread(self._show_progress, text)
+        return on_progress
+
+    def _show_progress(self, text):
+        try:
+            self.screen.query_one("#status-bar").update(text)
+        except Exception:
+            pass # Not on the data screen
+
     def save_file(self, filename):
+        # Streams source -> [normalize] -> file in a worker thread
+        self.run_worker(lambda: self._save_worker(filename), thread=True, exclusive=True)
+
+    def _save_worker(self, filename):
         try:
-            parser.save_data(self.current_data, filename)
-            self.pop_screen() # Close Save Dialog
-            self.notify(f"Saved to {filename}", severity="information")
+            report = parser.run_pipeline(self.current_data, sink=filename, validate=False,
+                                         normalize=self.normalize, on_progress=self.progress_callback("Saving"))
         except Exception as e:
-            self.notify(f"Error saving: {e}", severity="error")
+            self.call_from_thread(self.notify, f"Error saving: {e}", severity="error")
+            return
+        self.call_from_thread(self._save_done, filename, report)
+
+    def _save_done(self, filename, report):
+        if self.current_file and os.path.abspath(filename) == os.path.abspath(self.current_file) \
+                and isinstance(self.current_data, parser.RecordSource):
+            # The lazy source indexed the file that was just replaced
+            self.current_data = parser.load_data(filename)
+        self.pop_screen() # Close Save Dialog
+        self.notify(f"Saved {report['written']} records to {filename}", severity="information")
 
 def run_tui(filepath=None):
     app = AttendanceApp(initial_file=filepath)
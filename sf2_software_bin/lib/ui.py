@@ -1,10 +1,67 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QPushButton, QTableWidget, 
-                             QTableWidgetItem, QFileDialog, QLabel, QMessageBox)
-from PyQt6.QtCore import Qt
+                             QHBoxLayout, QPushButton, QTableView, 
+                             QFileDialog, QLabel, QMessageBox)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
 import os
 from . import parser
 
+# Rows added to the view each time it scrolls to the end of what is loaded
+FETCH_ROWS = 500
+
+class RecordTableModel(QAbstractTableModel):
+    """
+    Read-only table over a list of dicts or a parser.RecordSource.
+    Rows are exposed in batches of FETCH_ROWS through canFetchMore /
+    fetchMore, and data() reads only the records the view paints, so a
+    RecordSource parses just the chunks around the visible rows.
+    """
+
+    def __init__(self, records, parent=None):
+        super().__init__(parent)
+        self.records = records
+        if isinstance(records, parser.RecordSource) and records.fields:
+            self.headers = list(records.fields)
+        else:
+            self.headers = list(records[0].keys()) if records else []
+        self.loaded = 0
+
+    def _available(self, n):
+        if isinstance(self.records, parser.RecordSource):
+            return self.records.count_upto(n)
+        return min(n, len(self.records))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._available(self.loaded + 1) > self.loaded
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        available = self._available(self.loaded + FETCH_ROWS)
+        if available <= self.loaded:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, available - 1)
+        self.loaded = available
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        record = self.records[index.row()]
+        return str(record.get(self.headers[index.column()], ""))
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -40,7 +97,7 @@ class MainWindow(QMainWindow):
         layout.addLayout(top_layout)
         
         # Table
-        self.table = QTableWidget()
+        self.table = QTableView()
         layout.addWidget(self.table)
         
     def load_file(self):
@@ -73,25 +130,21 @@ class MainWindow(QMainWindow):
             self.lbl_status.setText(f"Loading {os.path.basename(filepath)}...")
             data = parser.load_data(filepath)
             self.populate_table(data)
-            self.lbl_status.setText(f"Loaded {len(data)} records.")
+            if isinstance(data, parser.RecordSource) and not data.length_known:
+                self.lbl_status.setText(f"Loaded ~{data.estimated_length()} records.")
+            else:
+                self.lbl_status.setText(f"Loaded {len(data)} records.")
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
             self.lbl_status.setText("Error loading file.")
 
     def populate_table(self, data):
-        if not data:
-            self.table.setRowCount(0)
-            self.table.setColumnCount(0)
+        if not isinstance(data, (list, parser.RecordSource)) or not data:
+            # Nothing tabular (e.g. an SF2 payload document)
+            self.table.setModel(None)
             return
 
-        # Assume list of dicts
-        headers = list(data[0].keys())
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(len(data))
-        
-        for row_idx, row_data in enumerate(data):
-            for col_idx, header in enumerate(headers):
-                item = QTableWidgetItem(str(row_data.get(header, "")))
-                self.table.setItem(row_idx, col_idx, item)
+        # The view pulls rows from the model as it scrolls
+        self.model = RecordTableModel(data, self)
+        self.table.setModel(self.model)
 
@@ -0,0 +1,508 @@
+"""
+Zip-level rendering engine for the SF2 template.
+
+The SF2 layout is fixed, so instead of loading the whole workbook into the
+openpyxl object model this engine precompiles the template once:
+
+- every archive member except the active sheet is written into a "prefix" zip
+  that is copied as raw bytes for each report,
+- the active sheet's XML is split into head, rows and tail so a render only
+  re-serializes the rows that processor.fill_sheet writes to.
+
+Two adjustments mirror what openpyxl does on save, so both engines produce the
+same workbook: calcChain.xml is dropped (it may point at cells we overwrite)
+and a calcPr with fullCalcOnLoad is added when the template has none. Shared
+formulas in the sheet are expanded into plain formulas, again like openpyxl.
+
+In the "cached" and "values" modes (see processor.VALUE_MODES) every
+statistic cell already carries its result, so the added calcPr leaves out
+fullCalcOnLoad unless the template has formulas of its own that are not
+overwritten (they would otherwise show stale results).
+"""
+import io
+import re
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from . import processor
+from . import template_cache
+from .processor import column_letter
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_OFFICE_DOCUMENT = NS_REL + "/officeDocument"
+REL_CALC_CHAIN = NS_REL + "/calcChain"
+REL_SHARED_STRINGS = NS_REL + "/sharedStrings"
+
+RE_SHEET_DATA = re.compile(r"<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>", re.S)
+RE_ROW = re.compile(r"<row\b[^>]*?/>|<row\b[^>]*>.*?</row>", re.S)
+RE_CELL = re.compile(r"<c\b[^>]*?/>|<c\b[^>]*>.*?</c>", re.S)
+RE_OPEN_TAG = re.compile(r"<(?:row|c)\b[^>]*?/?>", re.S)
+RE_ATTR_R = re.compile(r'\sr="([A-Z]*)(\d+)"')
+RE_ATTR_S = re.compile(r'\ss="(\d+)"')
+RE_COORD = re.compile(r"^([A-Z]+)(\d+)$")
+RE_SHARED_F = re.compile(r"<f\b([^>]*?)(?:/>|>(.*?)</f>)", re.S)
+RE_ILLEGAL_CHARS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+RE_CALC_PR = re.compile(r"<calcPr\b")
+RE_WORKBOOK_END = re.compile(r"</workbook>\s*$")
+RE_FORMULA = re.compile(rb"<f[\s>/]")
+RE_ATTR_T = re.compile(r'\st="(\w+)"')
+RE_CELL_F = re.compile(r"<f\b[^>]*?(?:/>|>(.*?)</f>)", re.S)
+RE_CELL_V = re.compile(r"<v>(.*?)</v>", re.S)
+RE_CELL_T = re.compile(r"<t\b[^>]*>(.*?)</t>", re.S)
+
+DEFAULT_CALC_PR = '<calcPr calcId="124519" fullCalcOnLoad="1"/>'
+NO_RECALC_CALC_PR = '<calcPr calcId="124519"/>'
+
+def column_index(letters):
+    """Converts a column name ("AF") to its 1-based index (32)."""
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx
+
+class SheetPatch:
+    """
+    Minimal stand-in for an openpyxl worksheet that records cell writes,
+    so processor.fill_sheet can drive this engine unchanged.
+    """
+
+    def __init__(self):
+        self.cells = {}
+
+    def __setitem__(self, coord, value):
+        match = RE_COORD.match(coord)
+        if not match:
+            raise ValueError(f"Invalid cell coordinate: {coord}")
+        self.cells[(int(match.group(2)), column_index(match.group(1)))] = value
+
+    def cell(self, row, column, value=None):
+        if value is not None:
+            self.cells[(row, column)] = value
+
+class _Row:
+    __slots__ = ("num", "xml", "open_tag", "cells")
+
+    def __init__(self, num, xml, open_tag, cells):
+        self.num = num
+        self.xml = xml                # original row, reused when untouched
+        self.open_tag = open_tag      # "<row ...>" (never self-closing)
+        self.cells = cells            # {col: (cell_xml, style_id or None)}
+
+class Skeleton:
+    """
+    A precompiled template: raw prefix zip plus the split active sheet.
+    prefix_no_recalc is the prefix without a forced recalculation (None when
+    the template's own calcPr is kept), formula_cells the (row, col) of the
+    active sheet's formulas and other_formulas whether other sheets have any.
+    """
+
+    def __init__(self, prefix, sheet_info, head, rows, tail, prefix_no_recalc=None,
+                 formula_cells=frozenset(), other_formulas=False):
+        self.prefix = prefix
+        self.sheet_info = sheet_info
+        self.head = head
+        self.rows = rows
+        self.tail = tail
+        self.prefix_no_recalc = prefix_no_recalc
+        self.formula_cells = formula_cells
+        self.other_formulas = other_formulas
+
+    def prefix_for(self, cells, values):
+        """
+        The prefix to render with: without forced recalculation only when
+        the statistics carry their results and no template formula is left.
+        """
+        if (values == processor.VALUES_FORMULAS or self.prefix_no_recalc is None
+                or self.other_formulas or not self.formula_cells.issubset(cells)):
+            return self.prefix
+        return self.prefix_no_recalc
+
+# Skeletons are not modified by a render, so every render can share the
+# cached one. zipfile.writestr updates the ZipInfo it is given (sizes, CRC,
+# header offset), so renders write a copy of sheet_info, never the original.
+_skeleton_cache = template_cache.TemplateCache(lambda path: compile_template(path))
+
+def get_template_cache_stats():
+    """
+    Returns hit/miss/invalidation counts for the compiled skeleton cache.
+    """
+    return _skeleton_cache.stats()
+
+def save_to_excel(data, template_path, output_path, values=processor.VALUES_FORMULAS):
+    """
+    Renders an SF2 report cell-for-cell equivalent to processor.save_to_excel
+    (openpyxl engine), patching only the sheet XML.
+    """
+    skeleton = _skeleton_cache.get(template_path)
+
+    patch = SheetPatch()
+    processor.fill_sheet(patch, data, values=values)
+
+    return write_workbook(skeleton, patch.cells, output_path, values=values)
+
+def write_workbook(skeleton, cells, output_path, values=processor.VALUES_FORMULAS):
+    """
+    Writes the skeleton with the given cells replaced.
+    cells: {(row, col): value}
+    """
+    sheet_xml = render_sheet(skeleton, cells)
+
+    buf = io.BytesIO(skeleton.prefix_for(cells, values))
+    buf.seek(0, io.SEEK_END)
+    with zipfile.ZipFile(buf, "a") as zf:
+        zf.writestr(_copy_info(skeleton.sheet_info), sheet_xml.encode("utf-8"))
+
+    # output_path may also be a writable binary stream
+    if hasattr(output_path, "write"):
+        output_path.write(buf.getbuffer())
+    else:
+        with open(output_path, "wb") as f:
+            f.write(buf.getbuffer())
+    return output_path
+
+def read_workbook(path):
+    """
+    Opens an existing report for patching. Returns (skeleton, values) where
+    values maps (row, col) of the active sheet to the cell's value: numbers,
+    strings, or processor.FormulaResult for formulas (value = cached result,
+    None when there is none).
+    """
+    skeleton = compile_template(path)
+    shared = _read_shared_strings(path)
+
+    values = {}
+    for row in skeleton.rows:
+        for col, (c_xml, _) in row.cells.items():
+            value = _cell_value(c_xml, shared)
+            if value is not None:
+                values[(row.num, col)] = value
+    return skeleton, values
+
+def _read_shared_strings(path):
+    with zipfile.ZipFile(path) as zf:
+        workbook_path = _find_workbook(zf)
+        rels = ET.fromstring(zf.read(_rels_path(workbook_path)))
+        for rel in rels.findall(f"{{{NS_PKG_REL}}}Relationship"):
+            if rel.get("Type") == REL_SHARED_STRINGS:
+                root = ET.fromstring(zf.read(_resolve_target(workbook_path, rel.get("Target"))))
+                return ["".join(t.text or "" for t in si.iter(f"{{{NS_MAIN}}}t"))
+                        for si in root.findall(f"{{{NS_MAIN}}}si")]
+    return []
+
+def _cell_value(c_xml, shared):
+    """The value of one serialized cell (see read_workbook)."""
+    c_tag = RE_OPEN_TAG.match(c_xml).group(0)
+    t_attr = RE_ATTR_T.search(c_tag)
+    cell_type = t_attr.group(1) if t_attr else "n"
+
+    if cell_type == "inlineStr":
+        value = "".join(_unescape(t) for t in RE_CELL_T.findall(c_xml))
+    else:
+        v = RE_CELL_V.search(c_xml)
+        value = _unescape(v.group(1)) if v else None
+        if value is not None and cell_type == "s":
+            value = shared[int(value)]
+        elif value is not None and cell_type == "b":
+            value = value == "1"
+        elif value not in (None, "") and cell_type == "n":
+            number = float(value)
+            value = int(number) if number.is_integer() else number
+
+    formula = RE_CELL_F.search(c_xml)
+    if formula and formula.group(1):
+        return processor.FormulaResult("=" + _unescape(formula.group(1)), value)
+    return value
+
+def render_sheet(skeleton, cells):
+    """
+    Rebuilds the sheet XML from the skeleton, replacing the given cells.
+    cells: {(row, col): value}
+    """
+    updates = {}
+    for (row, col), value in cells.items():
+        updates.setdefault(row, {})[col] = value
+
+    out = [skeleton.head]
+    pending = sorted(updates)
+    p = 0
+
+    for row in skeleton.rows:
+        # Rows that only exist in the update set go before this one
+        while p < len(pending) and pending[p] < row.num:
+            out.append(_render_row(None, pending[p], updates[pending[p]]))
+            p += 1
+
+        if p < len(pending) and pending[p] == row.num:
+            out.append(_render_row(row, row.num, updates[row.num]))
+            p += 1
+        else:
+            out.append(row.xml)
+
+    while p < len(pending):
+        out.append(_render_row(None, pending[p], updates[pending[p]]))
+        p += 1
+
+    out.append(skeleton.tail)
+    return "".join(out)
+
+def _render_row(row, row_num, values):
+    cells = dict(row.cells) if row else {}
+    for col, value in values.items():
+        existing = cells.get(col)
+        style = existing[1] if existing else None
+        cells[col] = (cell_xml(f"{column_letter(col)}{row_num}", style, value), style)
+
+    open_tag = row.open_tag if row else f'<row r="{row_num}">'
+    return open_tag + "".join(cells[col][0] for col in sorted(cells)) + "</row>"
+
+def cell_xml(ref, style, value):
+    """
+    Serializes one cell the way openpyxl would: formulas as <f>, strings
+    as inline strings, empty values as a bare (styled) cell.
+    """
+    s_attr = f' s="{style}"' if style is not None else ""
+
+    if value is None or value == "":
+        return f'<c r="{ref}"{s_attr}/>'
+
+    if isinstance(value, processor.FormulaResult):
+        return formula_cell_xml(ref, s_attr, value.formula, value.value)
+
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(value)}</v></c>'
+
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s_attr} t="n"><v>{value!r}</v></c>'
+
+    value = str(value)
+    if RE_ILLEGAL_CHARS.search(value):
+        raise ValueError(f"Cell {ref} contains characters that cannot be used in worksheets")
+
+    if value.startswith("=") and len(value) > 1:
+        return f'<c r="{ref}"{s_attr}><f>{escape(value[1:])}</f><v></v></c>'
+
+    space = ' xml:space="preserve"' if value != value.strip() else ""
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t{space}>{escape(value)}</t></is></c>'
+
+def formula_cell_xml(ref, s_attr, formula, result):
+    """
+    A formula cell with its cached result, so readers without a calculation
+    engine (e.g. openpyxl data_only) see the value.
+    """
+    f_xml = f"<f>{escape(formula[1:] if formula.startswith('=') else formula)}</f>"
+    if isinstance(result, bool):
+        return f'<c r="{ref}"{s_attr} t="b">{f_xml}<v>{int(result)}</v></c>'
+    if isinstance(result, (int, float)):
+        return f'<c r="{ref}"{s_attr}>{f_xml}<v>{result!r}</v></c>'
+    result = "" if result is None else str(result)
+    return f'<c r="{ref}"{s_attr} t="str">{f_xml}<v>{escape(result)}</v></c>'
+
+def compile_template(template_path):
+    """
+    Precompiles a template .xlsx into a Skeleton.
+    """
+    with zipfile.ZipFile(template_path) as zf:
+        workbook_path = _find_workbook(zf)
+        workbook_rels_path = _rels_path(workbook_path)
+        sheet_path, calc_chain_path = _find_parts(zf, workbook_path, workbook_rels_path)
+
+        members = []
+        other_formulas = False
+        for info in zf.infolist():
+            if info.filename in (sheet_path, calc_chain_path):
+                continue
+
+            data = zf.read(info)
+            if calc_chain_path and info.filename == workbook_rels_path:
+                data = _drop_calc_chain_rel(data)
+            elif calc_chain_path and info.filename == "[Content_Types].xml":
+                data = _drop_calc_chain_override(data, calc_chain_path)
+            elif info.filename.startswith("xl/worksheets/") and info.filename.endswith(".xml"):
+                other_formulas = other_formulas or bool(RE_FORMULA.search(data))
+            members.append((info, data))
+
+        sheet_info = _copy_info(zf.getinfo(sheet_path))
+        sheet_xml = zf.read(sheet_path).decode("utf-8")
+
+    # The workbook part differs between the two prefixes only when the
+    # template has no calcPr of its own.
+    prefix = _build_prefix(members, workbook_path, DEFAULT_CALC_PR)
+    prefix_no_recalc = None
+    workbook_xml = next(data for info, data in members if info.filename == workbook_path)
+    if not RE_CALC_PR.search(workbook_xml.decode("utf-8")):
+        prefix_no_recalc = _build_prefix(members, workbook_path, NO_RECALC_CALC_PR)
+
+    head, rows, tail = _split_sheet(sheet_xml)
+    formula_cells = frozenset((row.num, col) for row in rows for col, (c_xml, _) in row.cells.items() if "<f" in c_xml)
+    return Skeleton(prefix, sheet_info, head, rows, tail, prefix_no_recalc, formula_cells, other_formulas)
+
+def _build_prefix(members, workbook_path, calc_pr):
+    prefix = io.BytesIO()
+    with zipfile.ZipFile(prefix, "w") as out:
+        for info, data in members:
+            if info.filename == workbook_path:
+                data = _ensure_calc_pr(data, calc_pr)
+            out.writestr(_copy_info(info), data)
+    return prefix.getvalue()
+
+def _copy_info(info):
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    return new_info
+
+def _rels_path(part_path):
+    folder, name = posixpath.split(part_path)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+def _resolve_target(source_path, target):
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_path), target))
+
+def _find_workbook(zf):
+    root = ET.fromstring(zf.read("_rels/.rels"))
+    for rel in root.findall(f"{{{NS_PKG_REL}}}Relationship"):
+        if rel.get("Type") == REL_OFFICE_DOCUMENT:
+            return _resolve_target("", rel.get("Target"))
+    raise ValueError("Template has no workbook part")
+
+def _find_parts(zf, workbook_path, workbook_rels_path):
+    """Returns (active sheet path, calcChain path or None)."""
+    workbook = ET.fromstring(zf.read(workbook_path))
+    rels = ET.fromstring(zf.read(workbook_rels_path))
+
+    targets = {}
+    calc_chain_path = None
+    for rel in rels.findall(f"{{{NS_PKG_REL}}}Relationship"):
+        targets[rel.get("Id")] = _resolve_target(workbook_path, rel.get("Target"))
+        if rel.get("Type") == REL_CALC_CHAIN:
+            calc_chain_path = targets[rel.get("Id")]
+
+    active = 0
+    view = workbook.find(f"{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView")
+    if view is not None and view.get("activeTab"):
+        active = int(view.get("activeTab"))
+
+    sheets = workbook.findall(f"{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet")
+    if not sheets:
+        raise ValueError("Template workbook has no sheets")
+    if active >= len(sheets):
+        active = 0
+
+    rel_id = sheets[active].get(f"{{{NS_REL}}}id")
+    return targets[rel_id], calc_chain_path
+
+def _ensure_calc_pr(data, calc_pr=DEFAULT_CALC_PR):
+    text = data.decode("utf-8")
+    if RE_CALC_PR.search(text):
+        return data
+    # calcPr comes after the sheets/definedNames block; placing it right
+    # before the trailing elements keeps the schema order valid.
+    for anchor in ("<oleSize", "<customWorkbookViews", "<pivotCaches", "<smartTagPr",
+                   "<smartTagTypes", "<webPublishing", "<fileRecoveryPr", "<webPublishObjects",
+                   "<extLst"):
+        idx = text.find(anchor)
+        if idx != -1:
+            return (text[:idx] + calc_pr + text[idx:]).encode("utf-8")
+    return RE_WORKBOOK_END.sub(calc_pr + "</workbook>", text).encode("utf-8")
+
+def _drop_calc_chain_rel(data):
+    text = data.decode("utf-8")
+    text = re.sub(r'<Relationship\b[^>]*Type="%s"[^>]*/>' % re.escape(REL_CALC_CHAIN), "", text)
+    return text.encode("utf-8")
+
+def _drop_calc_chain_override(data, calc_chain_path):
+    text = data.decode("utf-8")
+    text = re.sub(r'<Override\b[^>]*PartName="/%s"[^>]*/>' % re.escape(calc_chain_path), "", text)
+    return text.encode("utf-8")
+
+def _split_sheet(sheet_xml):
+    match = RE_SHEET_DATA.search(sheet_xml)
+    if not match:
+        raise ValueError("Template sheet has no <sheetData>")
+
+    head = sheet_xml[:match.start()] + "<sheetData>"
+    tail = "</sheetData>" + sheet_xml[match.end():]
+    body = match.group(1) or ""
+
+    shared = {}
+    rows = []
+    last_row = 0
+    for row_match in RE_ROW.finditer(body):
+        row_xml = row_match.group(0)
+        open_tag = RE_OPEN_TAG.match(row_xml).group(0)
+        r_attr = RE_ATTR_R.search(open_tag)
+        row_num = int(r_attr.group(2)) if r_attr else last_row + 1
+        last_row = row_num
+
+        if open_tag.endswith("/>"):
+            open_tag = open_tag[:-2].rstrip() + ">"
+            if not r_attr:
+                open_tag = open_tag[:-1] + f' r="{row_num}">'
+            rows.append(_Row(row_num, open_tag + "</row>", open_tag, {}))
+            continue
+
+        if not r_attr:
+            open_tag = open_tag[:-1] + f' r="{row_num}">'
+
+        cells = {}
+        last_col = 0
+        changed = not r_attr
+        for cell_match in RE_CELL.finditer(row_xml, len(RE_OPEN_TAG.match(row_xml).group(0))):
+            c_xml = cell_match.group(0)
+            c_tag = RE_OPEN_TAG.match(c_xml).group(0)
+            ref = RE_ATTR_R.search(c_tag)
+            col = column_index(ref.group(1)) if ref and ref.group(1) else last_col + 1
+            last_col = col
+            if not ref:
+                coord = f"{column_letter(col)}{row_num}"
+                c_xml = c_xml.replace("<c", f'<c r="{coord}"', 1)
+                changed = True
+
+            if "<f" in c_xml and 't="shared"' in c_xml:
+                c_xml = _expand_shared_formula(c_xml, col, row_num, shared)
+                changed = True
+
+            style = RE_ATTR_S.search(c_tag)
+            cells[col] = (c_xml, style.group(1) if style else None)
+
+        if changed:
+            row_xml = open_tag + "".join(cells[c][0] for c in sorted(cells)) + "</row>"
+        rows.append(_Row(row_num, row_xml, open_tag, cells))
+
+    return head, rows, tail
+
+def _expand_shared_formula(c_xml, col, row_num, shared):
+    """Turns a shared-formula cell into a standalone formula (as openpyxl does on load)."""
+    match = RE_SHARED_F.search(c_xml)
+    attrs = match.group(1)
+    si = re.search(r'\ssi="(\d+)"', attrs)
+    if not si:
+        return c_xml
+
+    coord = f"{column_letter(col)}{row_num}"
+    text = match.group(2)
+    if text:
+        # Master cell
+        shared[si.group(1)] = (text, coord)
+        formula = text
+    elif si.group(1) in shared:
+        from openpyxl.formula.translate import Translator
+        master_text, master_coord = shared[si.group(1)]
+        formula = Translator("=" + _unescape(master_text), origin=master_coord).translate_formula(coord)[1:]
+        formula = escape(formula)
+    else:
+        return c_xml
+
+    return c_xml[:match.start()] + f"<f>{formula}</f>" + c_xml[match.end():]
+
+def escape(text):
+    # Same as xml.sax.saxutils.escape, which would pull in urllib at import.
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _unescape(text):
+    return text.replace("&lt;", "<").replace("&gt;", ">").replace("&quot;", '"').replace("&apos;", "'").replace("&amp;", "&")
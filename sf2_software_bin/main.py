@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 import sys
 import argparse
+import contextlib
 import os
 
 # Ensure lib can be imported
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from lib import parser
+# Modules under lib are imported inside the branch that needs them, so the
+# headless modes (--json, --json-lintcheck, daemons) start without loading
+# the GUI/TUI stacks. benchmarks/bench_startup.py guards this.
 
 def main():
     parser_args = argparse.ArgumentParser(description="SF2 Attendance Tool")
@@ -16,31 +19,76 @@ def main():
     parser_args.add_argument("--composer", action="store_true", help="Launch the TUI Composer directly")
     parser_args.add_argument("--composer-gui", action="store_true", help="Launch the GUI Composer directly")
     parser_args.add_argument("--json-lintcheck", type=str, help="Lint and check JSON file syntax and schema")
-    parser_args.add_argument("--json", type=str, help="Path to JSON file for automated processing")
+    parser_args.add_argument("--json", type=str, help="Path to JSON file for automated processing ('-' reads standard input)")
     parser_args.add_argument("--force-yes", action="store_true", help="Force automatic splitting of Excel sheets if student limits are exceeded")
+    parser_args.add_argument("--jobs", type=int, default=1, help="Number of worker processes for rendering bundle sections / split parts")
+    parser_args.add_argument("--engine", type=str, choices=["openpyxl", "xml"], help="Excel rendering engine (overrides SF2_ENGINE)")
+    parser_args.add_argument("--values", type=str, choices=["formulas", "cached", "values"],
+                             help="Statistic cells: formulas, formulas with cached results (xml engine), or plain values (overrides SF2_VALUES)")
+    parser_args.add_argument("--update", type=str, metavar="WORKBOOK",
+                             help="Patch an existing SF2 workbook with the delta given by --json instead of rendering a new one")
+    parser_args.add_argument("--output-dir", type=str, help="Directory for generated reports (default: next to the input, names suffixed with the run id)")
+    parser_args.add_argument("--emit-manifest", type=str, nargs="?", const="-", metavar="PATH",
+                             help="Write a JSON manifest of the generated files to PATH, or to stdout if no PATH is given")
+    parser_args.add_argument("--stdout", action="store_true",
+                             help="Write the result to standard output (the .xlsx, or a .zip when split into parts) instead of files")
+    parser_args.add_argument("--serve-stdio", action="store_true", help="Run as a render daemon speaking JSON-lines on stdin/stdout")
+    parser_args.add_argument("--serve-unix", type=str, metavar="PATH", help="Run as a render daemon on a Unix domain socket")
     
     args = parser_args.parse_args()
 
+    if args.stdout and (args.output_dir or args.emit_manifest):
+        parser_args.error("--stdout cannot be combined with --output-dir or --emit-manifest")
+    if args.update and (not args.json or args.stdout):
+        parser_args.error("--update needs the delta in --json and cannot be combined with --stdout")
+
+    # Rendering engine and value mode are read by lib.processor from the environment
+    if args.engine:
+        os.environ["SF2_ENGINE"] = args.engine
+    if args.values:
+        os.environ["SF2_VALUES"] = args.values
+
+    # Daemon Mode
+    if args.serve_stdio or args.serve_unix:
+        from lib import daemon
+        try:
+            if args.serve_unix:
+                daemon.serve_unix(args.serve_unix)
+            else:
+                daemon.serve_stdio()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
     # Lint Check
     if args.json_lintcheck:
         from lib import json_lintcheck
         success = json_lintcheck.check_json(args.json_lintcheck)
         sys.exit(0 if success else 1)
 
+    # Update Mode
+    if args.update:
+        try:
+            run_update_mode(args)
+            sys.exit(0)
+        except Exception as e:
+            print(f"Error updating workbook: {e}")
+            sys.exit(1)
+
     # JSON Mode
     if args.json:
+        # With a manifest or the workbook on stdout, progress messages move to stderr.
+        machine_stdout = args.stdout or args.emit_manifest == "-"
+        log_stream = sys.stderr if machine_stdout else sys.stdout
         try:
-            from lib import guardrails
-            guardrails.validate_student_count(args.json, force_split=args.force_yes)
-            
-            from lib import json_processor
-            json_processor.process_json_to_excel(args.json, force_split=args.force_yes)
+            with contextlib.redirect_stdout(log_stream):
+                run_json_mode(args)
             sys.exit(0)
         except Exception as e:
             if type(e).__name__ == "StudentLimitExceeded":
-                print(e)
+                print(e, file=log_stream)
             else:
-                print(f"Error processing JSON: {e}")
+                print(f"Error processing JSON: {e}", file=log_stream)
             sys.exit(1)
 
     # 2. Modes
@@ -116,6 +164,68 @@ def main():
         
     sys.exit(app.exec())
 
+def run_json_mode(args):
+    """Handles --json: parse, guardrails, render, optional manifest."""
+    import time
+    import json
+    started = time.perf_counter()
+
+    # Parse, validate and normalize the file once, then hand the
+    # result to the guardrails and the processor.
+    from lib import payload
+    parsed = payload.load(args.json)
+    parsed.raise_for_errors()
+    parsed_at = time.perf_counter()
+
+    from lib import guardrails
+    guardrails.enforce_student_limits(parsed, force_split=args.force_yes)
+    checked_at = time.perf_counter()
+    
+    from lib import json_processor
+    if args.stdout:
+        json_processor.write_to_stream(parsed, sys.__stdout__.buffer, force_split=args.force_yes)
+        sys.__stdout__.flush()
+        return
+
+    jobs = max(1, args.jobs)
+    if parsed.is_bundle:
+        manifest = json_processor.process_bundle_to_excel(parsed.source, output_dir=args.output_dir,
+                                                          force_split=args.force_yes, jobs=jobs, parsed=parsed)
+    else:
+        manifest = json_processor.write_reports(parsed, output_dir=args.output_dir,
+                                                force_split=args.force_yes, jobs=jobs)
+
+    if args.emit_manifest:
+        manifest["timings"] = {
+            "parse_ms": round((parsed_at - started) * 1000, 2),
+            "guardrails_ms": round((checked_at - parsed_at) * 1000, 2),
+            **manifest["timings"],
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        text = json.dumps(manifest, indent=4)
+        if args.emit_manifest == "-":
+            sys.__stdout__.write(text + "\n")
+            sys.__stdout__.flush()
+        else:
+            with open(args.emit_manifest, 'w') as f:
+                f.write(text + "\n")
+            print(f"Manifest written to: {args.emit_manifest}")
+
+def run_update_mode(args):
+    """Handles --update: apply the --json delta to an existing workbook."""
+    from lib import payload
+    from lib import processor
+
+    delta = payload.read_json(args.json)
+    output_path = None
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, os.path.basename(args.update))
+
+    result = processor.update_excel(args.update, delta, output_path=output_path, values=args.values)
+    print(f"Updated {result['path']}: {result['changed_cells']} cell(s) changed "
+          f"({result['students']} learner(s), {len(result['holidays'])} new holiday(s), values: {result['values']})")
+
 def handle_terminal_mode(args):
     """Handles logic for terminal-only execution."""
     
@@ -190,6 +300,7 @@ def run_cli_parse(filepath):
         except ImportError as e:
             print(f"Could not load TUI: {e}")
             # Fallback to print if TUI fails
+            from lib import parser
             data = parser.load_data(filepath)
             print(f"Successfully parsed {len(data)} records from {filepath}")
             print(data)
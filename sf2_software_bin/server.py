@@ -7,12 +7,31 @@ logger = envparse.logger
 
 def start_server_headless(config):
     logger.info("Starting up Network Server (Headless Mode)...")
-    handshake.start_server(config["HOST"], int(config["PORT"]))
+    from lib.network import prefork
+    from lib import processor
+    workers = prefork.resolve_workers(config.get("WORKERS", "1"))
+
+    # SF2_ENGINE / SF2_VALUES are checked once here instead of failing every request
+    try:
+        processor.resolve_value_mode()
+    except ValueError as e:
+        logger.error(f"Invalid rendering settings: {e}")
+        sys.exit(1)
+
+    if workers > 1:
+        prefork.serve(config["HOST"], int(config["PORT"]), workers,
+                      int(config.get("THREADS", "4")), int(config.get("BACKLOG", "128")))
+    else:
+        handshake.start_server(config["HOST"], int(config["PORT"]))
 
 def main():
     parser = argparse.ArgumentParser(description="SF2 Attendance Network Server")
     parser.add_argument("--mode", type=str, choices=["headless", "tui", "gui"],
                         help="Override the MODE defined in .env")
+    parser.add_argument("--workers", type=str,
+                        help="Override WORKERS (headless mode): a number, or 'auto' for one per CPU")
+    parser.add_argument("--threads", type=int,
+                        help="Override THREADS (request threads per worker)")
     
     args = parser.parse_args()
 
@@ -20,6 +39,10 @@ def main():
     config = envparse.load_or_create_env()
 
     # CLI Override
+    if args.workers:
+        config["WORKERS"] = args.workers
+    if args.threads:
+        config["THREADS"] = str(args.threads)
     mode = args.mode.upper() if args.mode else config.get("MODE", "HEADLESS")
 
     logger.info(f"Initializing SF2 Server components in {mode} mode.")